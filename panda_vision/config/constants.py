@@ -11,6 +11,45 @@ LINES_DELETED = 'lines_deleted'
 # Valeur par défaut du temps maximum de reconnaissance de tableau
 TABLE_MAX_TIME_VALUE = 400
 
+# Valeur par défaut du nombre de pages rendues à l'avance par le thread de rendu
+RENDER_PREFETCH_PAGES_VALUE = 4
+
+# Valeur par défaut du nombre de processus de rendu des pages, 0 pour rendre dans un seul thread
+RENDER_WORKERS_VALUE = 0
+
+# Valeurs par défaut du dpi adaptatif : hauteur visée de la taille de police dominante en pixels, dpi minimum et maximum
+ADAPTIVE_DPI_TARGET_TEXT_HEIGHT_VALUE = 28
+ADAPTIVE_DPI_MIN_VALUE = 120
+ADAPTIVE_DPI_MAX_VALUE = 300
+
+# Valeurs par défaut du côté des tuiles et de leur recouvrement, en pixels, pour l'analyse des pages trop grandes
+TILE_SIZE_VALUE = 2048
+TILE_OVERLAP_VALUE = 256
+
+# Valeur par défaut du nombre de pages dont l'ordre de lecture est prédit ensemble par layoutreader
+LAYOUTREADER_BATCH_SIZE_VALUE = 16
+
+# Valeur par défaut du nombre de pages analysées ensemble par doc_analyze
+ANALYZE_WINDOW_PAGES_VALUE = 16
+
+# Valeur par défaut du nombre de pages envoyées ensemble au modèle de mise en page
+LAYOUT_BATCH_SIZE_VALUE = 1
+
+# Valeur par défaut du nombre de pages envoyées ensemble au modèle de détection des formules
+MFD_BATCH_SIZE_VALUE = 1
+
+# Valeur par défaut du nombre de formules reconnues ensemble par le modèle de reconnaissance des formules
+MFR_BATCH_SIZE_VALUE = 64
+
+# Valeur par défaut du plus grand côté de l'image de détection de texte quand elle est faite sur la page entière
+PAGE_DET_LIMIT_SIDE_LEN_VALUE = 2400
+
+# Valeur par défaut de la taille des files entre les étages du pipeline d'analyse
+PIPELINE_QUEUE_SIZE_VALUE = 2
+
+# Valeur par défaut de la taille maximale du cache des résultats de modèle, en Mo
+MODEL_CACHE_MAX_SIZE_MB_VALUE = 1024
+
 # Longueur maximale du résultat de tableau pp
 TABLE_MAX_LEN = 480
 
@@ -0,0 +1,86 @@
+import cv2
+import fitz
+import numpy as np
+
+# Plus grand côté, en pixels, au-delà duquel fitz_doc_to_image repasse en 72 dpi
+MAX_RENDER_SIDE = 4500
+# Rapport moyen entre la hauteur d'un caractère isolé sur l'image (minuscules et majuscules mêlées) et la taille
+# de la police, utilisé pour passer des composantes connexes d'un scan à une taille de police
+GLYPH_TO_FONT_SIZE_RATIO = 0.6
+
+
+class AdaptiveDpiPolicy:
+    def __init__(self, target_text_height: int = 28, min_dpi: int = 120, max_dpi: int = 300,
+                 probe_dpi: int = 100, min_text_chars: int = 20, max_side: int = MAX_RENDER_SIDE):
+        """Choix du dpi de rendu page par page.
+
+        La taille de police dominante est estimée depuis la couche texte, ou depuis une image de sonde en basse
+        résolution pour les pages scannées, puis le plus petit dpi qui donne au moins target_text_height pixels à
+        cette taille de police est retenu, borné à [min_dpi, max_dpi] et à un plus grand côté de max_side pixels.
+
+        Args:
+            target_text_height (int, optional): la hauteur visée de la taille de police dominante, en pixels.
+                Par défaut 28, soit le rendu d'un texte en 10 points à 200 dpi.
+            min_dpi (int, optional): le dpi minimum. Par défaut 120.
+            max_dpi (int, optional): le dpi maximum. Par défaut 300.
+            probe_dpi (int, optional): le dpi de l'image de sonde des pages sans couche texte. Par défaut 100.
+            min_text_chars (int, optional): le nombre de caractères en dessous duquel la couche texte n'est pas
+                jugée fiable. Par défaut 20.
+            max_side (int, optional): le plus grand côté maximum de l'image, None pour ne pas borner (pages
+                analysées par tuiles). Par défaut MAX_RENDER_SIDE.
+        """
+        self.target_text_height = target_text_height
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+        self.probe_dpi = probe_dpi
+        self.min_text_chars = min_text_chars
+        self.max_side = max_side
+
+    def __call__(self, page) -> int:
+        font_size = self.__text_layer_font_size(page)
+        if font_size is None:
+            font_size = self.__probe_font_size(page)
+        if font_size is None or font_size <= 0:
+            dpi = self.max_dpi
+        else:
+            dpi = self.target_text_height * 72 / font_size
+        dpi = min(max(dpi, self.min_dpi), self.max_dpi)
+        # Rester sous la taille qui ferait basculer fitz_doc_to_image en 72 dpi
+        page_side = max(page.rect.width, page.rect.height)
+        if self.max_side is not None and page_side > 0:
+            dpi = min(dpi, self.max_side * 72 / page_side)
+        return max(int(dpi), 1)
+
+    def __text_layer_font_size(self, page):
+        """Taille de police médiane pondérée par le nombre de caractères, None si la couche texte est trop pauvre."""
+        sizes = []
+        weights = []
+        for block in page.get_text('dict', flags=fitz.TEXTFLAGS_TEXT)['blocks']:
+            for line in block.get('lines', []):
+                for span in line['spans']:
+                    char_count = len(span['text'].strip())
+                    if char_count > 0 and span['size'] > 0:
+                        sizes.append(span['size'])
+                        weights.append(char_count)
+        if sum(weights) < self.min_text_chars:
+            return None
+        order = np.argsort(sizes)
+        cumulative = np.cumsum(np.asarray(weights)[order])
+        return float(np.asarray(sizes)[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+    def __probe_font_size(self, page):
+        """Taille de police estimée depuis la hauteur médiane des composantes connexes d'une image en basse
+        résolution, None si aucune composante ne ressemble à un caractère."""
+        pm = page.get_pixmap(matrix=fitz.Matrix(self.probe_dpi / 72, self.probe_dpi / 72), colorspace=fitz.csGRAY,
+                             alpha=False)
+        img = np.frombuffer(pm.samples, dtype=np.uint8).reshape(pm.height, pm.stride)[:, :pm.width]
+        _, binary = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        # Écarter le bruit, les filets et les illustrations
+        glyph_mask = (heights >= 3) & (heights <= pm.height / 20) & (widths <= heights * 3)
+        if glyph_mask.sum() < self.min_text_chars:
+            return None
+        glyph_height = float(np.median(heights[glyph_mask])) * 72 / self.probe_dpi
+        return glyph_height / GLYPH_TO_FONT_SIZE_RATIO
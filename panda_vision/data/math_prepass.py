@@ -0,0 +1,124 @@
+import re
+
+import fitz
+
+# Polices réservées aux mathématiques (TeX, OpenType MATH, équations Office), un seul caractère suffit
+_MATH_FONT_PATTERN = re.compile(
+    r'CMMI|CMSY|CMEX|CMBSY|MSAM|MSBM|EUFM|EUSM|EUEX|RSFS|LMMath|MathItalic|MathSymbol|MathExtension|'
+    r'Cambria ?Math|STIX|XITS|Asana|TeXGyre\w*Math|LatinModernMath|Euclid|MT ?Extra|MathematicalPi|'
+    r'txmi|txsy|txex|pxmi|pxsy|pxex|ntxmi|ntxsy|MTMI|MTSY|MTEX|Symbol',
+    re.IGNORECASE,
+)
+# Puces et signes de liste des polices Symbol et Wingdings, sans rapport avec les formules
+_BULLET_CHARS = {'•', '·', '∙', '◦', '▪', '■', '□', '●', '○', '-', '\uf0b7', '\uf0a7', '\uf0a8', '\uf076',
+                 '\uf0d8', '\uf0fc', '\uf06e', '\uf0e0', '\uf0be'}
+# Plages Unicode propres aux formules, un seul caractère suffit
+_STRONG_MATH_RANGES = [
+    (0x2200, 0x22FF),  # opérateurs mathématiques
+    (0x27C0, 0x27EF),  # symboles mathématiques divers A
+    (0x2980, 0x29FF),  # symboles mathématiques divers B
+    (0x2A00, 0x2AFF),  # opérateurs mathématiques supplémentaires
+    (0x1D400, 0x1D7FF),  # alphanumériques mathématiques
+]
+# Plages aussi présentes dans la prose (lettres grecques, flèches, unités), plusieurs caractères sont demandés
+_WEAK_MATH_RANGES = [
+    (0x0391, 0x03C9),  # lettres grecques
+    (0x2070, 0x209F),  # exposants et indices
+    (0x2190, 0x21FF),  # flèches
+    (0x2100, 0x214F),  # symboles lettrés
+]
+_WEAK_MATH_CHARS = {'±', '×', '÷', '¬', '√', '∞', '≈', '≠', '≤', '≥'}
+# Caractères d'une couche texte dont l'encodage est inexploitable
+_UNKNOWN_CHAR_PATTERN = re.compile('[\ufffd\ue000-\uf8ff]')
+# Décalage de la ligne de base, rapporté à la taille de la police, à partir duquel un span est un indice ou un exposant
+_SCRIPT_BASELINE_SHIFT_RATIO = 0.15
+_SCRIPT_SIZE_RATIO = 0.85
+
+
+def _in_ranges(char: str, ranges: list) -> bool:
+    code = ord(char)
+    return any(start <= code <= end for start, end in ranges)
+
+
+def _script_kind(span: dict, main_span: dict, block_main_spans: list):
+    """'sub' ou 'sup' si le span est plus petit que le texte qui l'entoure et décalé sous ou au-dessus de sa ligne de
+    base, None sinon. Un span isolé sur sa ligne est comparé aux lignes du bloc qui le chevauchent verticalement."""
+    reference_spans = [main_span] if span is not main_span else [
+        other for other in block_main_spans
+        if other is not span and other['bbox'][1] < span['bbox'][3] and span['bbox'][1] < other['bbox'][3]
+    ]
+    for reference_span in reference_spans:
+        if span['size'] >= reference_span['size'] * _SCRIPT_SIZE_RATIO:
+            continue
+        baseline_shift = span['origin'][1] - reference_span['origin'][1]
+        if baseline_shift > reference_span['size'] * _SCRIPT_BASELINE_SHIFT_RATIO:
+            return 'sub'
+        if baseline_shift < -reference_span['size'] * _SCRIPT_BASELINE_SHIFT_RATIO:
+            return 'sup'
+    return None
+
+
+def page_may_contain_math(page, min_text_chars: int = 20, min_weak_evidence: int = 3,
+                          max_image_ratio: float = 0.5) -> bool:
+    """Indique, depuis la seule couche texte, si une page peut contenir des formules et doit passer par la
+    détection des formules.
+
+    Une page est retenue dès qu'un caractère est dans une police mathématique ou dans une plage Unicode propre
+    aux formules, ou qu'un span est en indice, ou que min_weak_evidence indices plus faibles (lettres grecques,
+    flèches, exposants qui ne sont pas des appels de note) sont trouvés. Les pages dont la couche texte n'est pas
+    fiable (trop pauvre, mal encodée, ou page scannée avec une couche OCR) sont toujours retenues.
+
+    Args:
+        page (fitz.Page): la page
+        min_text_chars (int, optional): le nombre de caractères en dessous duquel la couche texte n'est pas jugée
+            fiable. Par défaut 20.
+        min_weak_evidence (int, optional): le nombre d'indices faibles qui suffit à retenir la page. Par défaut 3.
+        max_image_ratio (float, optional): la part de la page couverte par des images au-delà de laquelle la page
+            est considérée comme scannée. Par défaut 0.5.
+
+    Returns:
+        bool: False si la page ne contient vraisemblablement pas de formule
+    """
+    page_area = abs(page.rect)
+    if page_area <= 0:
+        return True
+    image_area = sum(abs(fitz.Rect(image_info['bbox']) & page.rect) for image_info in page.get_image_info())
+    if image_area / page_area > max_image_ratio:
+        return True
+
+    text_chars = 0
+    unknown_chars = 0
+    weak_evidence = 0
+    for block in page.get_text('dict', flags=fitz.TEXTFLAGS_TEXT)['blocks']:
+        lines_spans = [[span for span in line['spans'] if span['text'].strip()] for line in block.get('lines', [])]
+        lines_spans = [spans for spans in lines_spans if len(spans) > 0]
+        # La ligne de base et la taille d'une ligne sont celles de son span le plus long
+        main_spans = [max(spans, key=lambda span: len(span['text'])) for spans in lines_spans]
+        for spans, main_span in zip(lines_spans, main_spans):
+            for span in spans:
+                text = span['text']
+                text_chars += len(text.strip())
+                unknown_chars += len(_UNKNOWN_CHAR_PATTERN.findall(text))
+                if _MATH_FONT_PATTERN.search(span['font']) and any(
+                        not char.isspace() and char not in _BULLET_CHARS and not _UNKNOWN_CHAR_PATTERN.match(char)
+                        for char in text):
+                    return True
+                for char in text:
+                    if char in _BULLET_CHARS:
+                        continue
+                    if _in_ranges(char, _STRONG_MATH_RANGES):
+                        return True
+                    if char in _WEAK_MATH_CHARS or _in_ranges(char, _WEAK_MATH_RANGES):
+                        weak_evidence += 1
+                script_kind = _script_kind(span, main_span, main_spans)
+                if script_kind == 'sub':
+                    return True
+                if script_kind == 'sup' and not re.fullmatch(r'[\d*†‡,]+', text.strip()):
+                    # Exposant qui n'est pas un appel de note
+                    weak_evidence += 1
+            if weak_evidence >= min_weak_evidence:
+                return True
+
+    if text_chars < min_text_chars or unknown_chars > text_chars * 0.1:
+        return True
+    return False
@@ -0,0 +1,143 @@
+import math
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterable, Iterator, Tuple
+
+import fitz
+import numpy as np
+from loguru import logger
+
+from panda_vision.data.utils import fitz_doc_to_image
+
+# Document ouvert une seule fois par processus de rendu
+_worker_doc = None
+_worker_dpi = 200
+_worker_page_dpis = {}
+
+
+def _init_render_worker(pdf_bytes: bytes, dpi: int, page_dpis: dict = None):
+    global _worker_doc, _worker_dpi, _worker_page_dpis
+    _worker_doc = fitz.open('pdf', pdf_bytes)
+    _worker_dpi = dpi
+    _worker_page_dpis = page_dpis or {}
+
+
+def _render_shard(page_ids: list) -> list:
+    """Rend un lot de pages dans le processus de rendu.
+
+    Les pixels sont écrits dans un segment de mémoire partagée par page, seuls le nom du segment et la forme de
+    l'image repassent par le pipe du pool.
+    """
+    shard_res = []
+    for page_id in page_ids:
+        page = _worker_doc[page_id]
+        dpi = _worker_page_dpis.get(page_id, _worker_dpi)
+        img_dict = fitz_doc_to_image(page, dpi=dpi)
+        img = img_dict['img']
+        shm = shared_memory.SharedMemory(create=True, size=max(img.nbytes, 1))
+        np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[:] = img
+        shard_res.append((page_id, shm.name, img.shape, img_dict['width'], img_dict['height']))
+        shm.close()
+        # Le processus principal devient propriétaire du segment et se charge de le supprimer
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shard_res
+
+
+def _take_from_shared_memory(shm_name: str, shape: tuple, width: int, height: int) -> dict:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        img = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return {'img': img, 'width': width, 'height': height}
+
+
+def _unlink_shared_memory(shm_name: str):
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _release_shard(future: Future):
+    """Libère la mémoire partagée d'un lot qui ne sera jamais consommé."""
+    if future.cancel():
+        return
+    try:
+        shard_res = future.result()
+    except Exception:
+        return
+    for _, shm_name, _, _, _ in shard_res:
+        _unlink_shared_memory(shm_name)
+
+
+class PageRenderPool:
+    def __init__(self, pdf_bytes: bytes, workers: int, dpi: int = 200, page_dpis: dict = None):
+        """Pool de processus de rendu des pages d'un pdf.
+
+        Chaque processus ouvre les octets du pdf une seule fois puis rend les lots de pages qui lui sont confiés,
+        les images revenant par mémoire partagée plutôt que sous forme de tableaux sérialisés.
+
+        Args:
+            pdf_bytes (bytes): les octets du pdf
+            workers (int): le nombre de processus de rendu
+            dpi (int, optional): le dpi de rendu. Par défaut 200.
+            page_dpis (dict, optional): le dpi {page_id: dpi} des pages dont le dpi est choisi page par page, qui
+                remplace dpi pour ces pages. Par défaut None.
+        """
+        self._workers = max(workers, 1)
+        with fitz.open('pdf', pdf_bytes) as doc:
+            self._page_count = doc.page_count
+        self._executor = ProcessPoolExecutor(
+            max_workers=self._workers,
+            initializer=_init_render_worker,
+            initargs=(pdf_bytes, dpi, page_dpis),
+        )
+        logger.info(f'pool de rendu démarré, processus: {self._workers}, pages: {self._page_count}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def iter_images(self, page_ids: Iterable[int], prefetch_pages: int = 4) -> Iterator[Tuple[int, dict]]:
+        """Rend les pages demandées par lots répartis entre les processus et les renvoie dans l'ordre.
+
+        Au plus prefetch_pages pages (arrondies au lot près) sont rendues à l'avance.
+
+        Args:
+            page_ids (Iterable[int]): les index des pages à rendre
+            prefetch_pages (int, optional): le nombre de pages rendues à l'avance. Par défaut 4.
+
+        Yields:
+            Tuple[int, dict]: l'index de la page et {'img': tableau numpy, 'width': largeur, 'height': hauteur}
+        """
+        page_ids = list(page_ids)
+        shard_size = max(1, math.ceil(prefetch_pages / self._workers))
+        shards = [page_ids[i: i + shard_size] for i in range(0, len(page_ids), shard_size)]
+        max_in_flight = max(self._workers, math.ceil(prefetch_pages / shard_size))
+
+        in_flight = []
+        current_shard = []
+        next_shard = 0
+        try:
+            while next_shard < len(shards) or in_flight:
+                while next_shard < len(shards) and len(in_flight) < max_in_flight:
+                    in_flight.append(self._executor.submit(_render_shard, shards[next_shard]))
+                    next_shard += 1
+                current_shard = in_flight.pop(0).result()
+                while current_shard:
+                    page_id, shm_name, shape, width, height = current_shard.pop(0)
+                    yield page_id, _take_from_shared_memory(shm_name, shape, width, height)
+        finally:
+            for _, shm_name, _, _, _ in current_shard:
+                _unlink_shared_memory(shm_name)
+            for future in in_flight:
+                _release_shard(future)
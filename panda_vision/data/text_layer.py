@@ -0,0 +1,62 @@
+import fitz
+
+
+def _is_unknown_char(char: str) -> bool:
+    """Caractère d'une couche texte dont l'encodage est inexploitable."""
+    return char == '\ufffd' or '\ue000' <= char <= '\uf8ff'
+
+
+def text_layer_line_bboxes(page, min_text_chars: int = 20, max_image_ratio: float = 0.5,
+                           max_unknown_ratio: float = 0.1):
+    """Boîtes des lignes de la couche texte, utilisables à la place de la détection de texte en mode txt.
+
+    Chaque ligne du rawdict donne une boîte serrée sur ses caractères visibles. La couche texte n'est retenue que
+    si elle est fiable : assez de caractères, peu de caractères mal encodés, pas de page scannée sous une couche
+    OCR, et uniquement des lignes horizontales sur une page sans rotation.
+
+    Args:
+        page (fitz.Page): la page
+        min_text_chars (int, optional): le nombre de caractères en dessous duquel la couche texte n'est pas jugée
+            fiable. Par défaut 20.
+        max_image_ratio (float, optional): la part de la page couverte par des images au-delà de laquelle la page
+            est considérée comme scannée. Par défaut 0.5.
+        max_unknown_ratio (float, optional): la part de caractères mal encodés au-delà de laquelle la couche texte
+            n'est pas jugée fiable. Par défaut 0.1.
+
+    Returns:
+        list: les boîtes [x0, y0, x1, y1] des lignes en fraction de la largeur et de la hauteur de la page, None si
+            la couche texte n'est pas fiable
+    """
+    page_rect = page.rect
+    if page.rotation != 0 or page_rect.is_empty:
+        return None
+    image_area = sum(abs(fitz.Rect(image_info['bbox']) & page_rect) for image_info in page.get_image_info())
+    if image_area / abs(page_rect) > max_image_ratio:
+        return None
+
+    line_bboxes = []
+    text_chars = 0
+    unknown_chars = 0
+    for block in page.get_text('rawdict', flags=fitz.TEXTFLAGS_TEXT, clip=page_rect)['blocks']:
+        for line in block.get('lines', []):
+            chars = [char for span in line['spans'] for char in span['chars'] if not char['c'].isspace()]
+            if len(chars) == 0:
+                continue
+            if abs(line['dir'][1]) > 1e-3 or line['dir'][0] <= 0:
+                # Texte vertical ou tourné, laissé à la détection
+                return None
+            text_chars += len(chars)
+            unknown_chars += sum(_is_unknown_char(char['c']) for char in chars)
+            # Boîte verticale de la ligne, les caractères donnant la boîte horizontale
+            line_bboxes.append([
+                min(char['bbox'][0] for char in chars), line['bbox'][1],
+                max(char['bbox'][2] for char in chars), line['bbox'][3],
+            ])
+    if text_chars < min_text_chars or unknown_chars > text_chars * max_unknown_ratio:
+        return None
+
+    return [
+        [(x0 - page_rect.x0) / page_rect.width, (y0 - page_rect.y0) / page_rect.height,
+         (x1 - page_rect.x0) / page_rect.width, (y1 - page_rect.y0) / page_rect.height]
+        for x0, y0, x1, y1 in line_bboxes
+    ]
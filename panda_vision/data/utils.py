@@ -1,3 +1,5 @@
+import hashlib
+import re
 
 import fitz
 import numpy as np
@@ -30,3 +32,134 @@ def fitz_doc_to_image(doc, dpi=200) -> dict:
     img_dict = {'img': img, 'width': pm.width, 'height': pm.height}
 
     return img_dict
+
+
+_PDF_TOKEN_PATTERN = re.compile(r'<<|>>|\[|\]|\{|\}|<[0-9A-Fa-f\s]*>|/[^\s/\[\]<>(){}%]*|[^\s/\[\]<>(){}%]+')
+# Références remontant vers l'arbre des pages, qui feraient dépendre l'empreinte du document entier
+_PDF_BACK_REF_KEYS = {'/Parent', '/P'}
+# Clés de l'encodage du flux, le flux étant haché une fois décodé
+_PDF_STREAM_KEYS = {'/Length', '/Filter', '/DecodeParms'}
+
+
+def _pdf_tokenize(source: str) -> list:
+    tokens = []
+    pos = 0
+    while pos < len(source):
+        if source[pos] == '(':
+            # Chaîne littérale, les parenthèses non échappées peuvent être imbriquées
+            depth, end = 0, pos
+            while end < len(source):
+                if source[end] == '\\':
+                    end += 2
+                    continue
+                depth += {'(': 1, ')': -1}.get(source[end], 0)
+                end += 1
+                if depth == 0:
+                    break
+            tokens.append(source[pos:end])
+            pos = end
+            continue
+        match = _PDF_TOKEN_PATTERN.match(source, pos)
+        if match is None:
+            pos += 1
+            continue
+        tokens.append(match.group())
+        pos = match.end()
+    return tokens
+
+
+def _pdf_canonical(tokens: list, pos: int, resolve, skip_keys: set) -> tuple:
+    """Forme canonique de l'objet pdf commençant à tokens[pos] : clés de dictionnaire triées et références
+    remplacées par resolve(xref). Renvoie la forme et la position suivant l'objet."""
+    token = tokens[pos]
+    if token == '<<':
+        items = []
+        pos += 1
+        while pos < len(tokens) and tokens[pos] != '>>':
+            key = tokens[pos]
+            value, pos = _pdf_canonical(tokens, pos + 1, resolve, set())
+            if key not in skip_keys:
+                items.append(f'{key} {value}')
+        return '<<' + ' '.join(sorted(items)) + '>>', pos + 1
+    if token == '[':
+        values = []
+        pos += 1
+        while pos < len(tokens) and tokens[pos] != ']':
+            value, pos = _pdf_canonical(tokens, pos, resolve, set())
+            values.append(value)
+        return '[' + ' '.join(values) + ']', pos + 1
+    if pos + 2 < len(tokens) and tokens[pos + 2] == 'R' and token.isdigit() and tokens[pos + 1].isdigit():
+        return resolve(int(token)), pos + 3
+    return token, pos + 1
+
+
+def _pdf_source_digest(source: str, resolve, skip_keys: set) -> str:
+    tokens = _pdf_tokenize(source)
+    if len(tokens) == 0:
+        return ''
+    canonical, _ = _pdf_canonical(tokens, 0, resolve, skip_keys | _PDF_BACK_REF_KEYS)
+    return canonical
+
+
+def _pdf_object_digest(doc, xref: int, memo: dict, visiting: set) -> str:
+    if xref in memo:
+        return memo[xref]
+    if xref in visiting:
+        return 'cycle'
+    visiting.add(xref)
+    hasher = hashlib.md5()
+    is_stream = doc.xref_is_stream(xref)
+    # Les numéros d'objets diffèrent d'un fichier à l'autre, les références sont remplacées par l'empreinte
+    # de l'objet référencé et les clés des dictionnaires triées
+    hasher.update(_pdf_source_digest(
+        doc.xref_object(xref, compressed=True),
+        lambda ref_xref: _pdf_object_digest(doc, ref_xref, memo, visiting),
+        _PDF_STREAM_KEYS if is_stream else set(),
+    ).encode('utf-8'))
+    if is_stream:
+        hasher.update(doc.xref_stream(xref))
+    visiting.discard(xref)
+    memo[xref] = hasher.hexdigest()
+    return memo[xref]
+
+
+def compute_page_digest(doc, page_id: int, memo: dict = None) -> str:
+    """Empreinte du contenu d'une page calculée sans rendu, à partir de ses flux de contenu, de ses ressources
+    (polices, images, xobjects), de ses annotations et de sa géométrie.
+
+    Deux pages identiques de deux versions d'un même document ont la même empreinte, même si les numéros
+    d'objets du pdf diffèrent.
+
+    Args:
+        doc (fitz.Document): le document
+        page_id (int): l'index de la page
+        memo (dict, optional): les empreintes d'objets déjà calculées, à partager entre les pages d'un document.
+            Par défaut None.
+
+    Returns:
+        str: l'empreinte md5 de la page
+    """
+    memo = {} if memo is None else memo
+    page = doc[page_id]
+    hasher = hashlib.md5()
+    hasher.update(f'{tuple(page.mediabox)}|{tuple(page.cropbox)}|{page.rotation}'.encode('utf-8'))
+    hasher.update(page.read_contents())
+
+    # Les ressources peuvent être héritées d'un nœud parent de l'arbre des pages
+    node_xref = page.xref
+    resources_type, resources = doc.xref_get_key(node_xref, 'Resources')
+    while resources_type == 'null':
+        parent_type, parent = doc.xref_get_key(node_xref, 'Parent')
+        if parent_type != 'xref':
+            break
+        node_xref = int(parent.split()[0])
+        resources_type, resources = doc.xref_get_key(node_xref, 'Resources')
+    hasher.update(_pdf_source_digest(
+        resources, lambda ref_xref: _pdf_object_digest(doc, ref_xref, memo, set()), set()
+    ).encode('utf-8'))
+
+    for annot in page.annots():
+        hasher.update(f'{annot.type}|{tuple(annot.rect)}|{annot.info.get("content", "")}'.encode('utf-8'))
+    for widget in page.widgets():
+        hasher.update(f'{widget.field_name}|{widget.field_value}|{tuple(widget.rect)}'.encode('utf-8'))
+    return hasher.hexdigest()
@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 
 def _is_in_or_part_overlap(box1, box2) -> bool:
     """Vérifie si deux bbox se chevauchent partiellement ou sont incluses l'une dans l'autre."""
@@ -472,3 +474,163 @@ def calculate_vertical_projection_overlap_ratio(block1, block2):
 
     # Proportion de l'axe x couverte par l'intersection
     return intersection_length / block1_length
+
+
+"""
+Versions matricielles des fonctions ci-dessus : chaque fonction prend deux ensembles de bbox N×4 et M×4 (listes ou
+tableaux numpy) et renvoie la matrice N×M des valeurs de la fonction scalaire pour chaque couple (bboxes1[i],
+bboxes2[j]), calculées avec les mêmes opérations pour donner exactement les mêmes résultats.
+"""
+
+
+def _as_bbox_array(bboxes) -> np.ndarray:
+    """Tableau N×4 des bbox, les coordonnées entières restant entières comme dans les fonctions scalaires."""
+    bboxes = np.asarray(bboxes)
+    if bboxes.size == 0:
+        return bboxes.reshape(0, 4)
+    return bboxes
+
+
+def _intersection_matrix(bboxes1, bboxes2):
+    """Surface des intersections et masque des couples disjoints, avec les conventions des fonctions scalaires."""
+    b1 = _as_bbox_array(bboxes1)[:, None, :]
+    b2 = _as_bbox_array(bboxes2)[None, :, :]
+    x_left = np.maximum(b1[..., 0], b2[..., 0])
+    y_top = np.maximum(b1[..., 1], b2[..., 1])
+    x_right = np.minimum(b1[..., 2], b2[..., 2])
+    y_bottom = np.minimum(b1[..., 3], b2[..., 3])
+    disjoint = (x_right < x_left) | (y_bottom < y_top)
+    intersection_area = (x_right - x_left) * (y_bottom - y_top)
+    return intersection_area, disjoint
+
+
+def _area_array(bboxes) -> np.ndarray:
+    bboxes = _as_bbox_array(bboxes)
+    return (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+
+
+def calculate_iou_matrix(bboxes1, bboxes2) -> np.ndarray:
+    """Matrice de calculate_iou. Là où l'union est nulle, la fonction scalaire lève ZeroDivisionError et la matrice
+    vaut 0."""
+    intersection_area, disjoint = _intersection_matrix(bboxes1, bboxes2)
+    union_area = _area_array(bboxes1)[:, None] + _area_array(bboxes2)[None, :] - intersection_area
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = intersection_area / union_area.astype(np.float64)
+    return np.where(disjoint | (union_area == 0), 0.0, iou)
+
+
+def calculate_overlap_area_2_minbox_area_ratio_matrix(bboxes1, bboxes2) -> np.ndarray:
+    """Matrice de calculate_overlap_area_2_minbox_area_ratio."""
+    intersection_area, disjoint = _intersection_matrix(bboxes1, bboxes2)
+    min_box_area = np.minimum(_area_array(bboxes1)[:, None], _area_array(bboxes2)[None, :])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = intersection_area / min_box_area
+    return np.where(disjoint | (min_box_area == 0), 0.0, ratio)
+
+
+def calculate_overlap_area_in_bbox1_area_ratio_matrix(bboxes1, bboxes2) -> np.ndarray:
+    """Matrice de calculate_overlap_area_in_bbox1_area_ratio, rapportée à la surface des bboxes1."""
+    intersection_area, disjoint = _intersection_matrix(bboxes1, bboxes2)
+    bbox1_area = np.broadcast_to(_area_array(bboxes1)[:, None], intersection_area.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = intersection_area / bbox1_area
+    return np.where(disjoint | (bbox1_area == 0), 0.0, ratio)
+
+
+def get_minbox_if_overlap_by_ratio_matrix(bboxes1, bboxes2, ratio) -> np.ndarray:
+    """Matrice de get_minbox_if_overlap_by_ratio : 0 quand la fonction scalaire renvoie bbox1, 1 quand elle renvoie
+    bbox2 et -1 quand elle renvoie None."""
+    overlap_ratio = calculate_overlap_area_2_minbox_area_ratio_matrix(bboxes1, bboxes2)
+    bbox1_is_min = _area_array(bboxes1)[:, None] <= _area_array(bboxes2)[None, :]
+    return np.where(overlap_ratio > ratio, np.where(bbox1_is_min, 0, 1), -1)
+
+
+def _is_in_matrix(bboxes1, bboxes2) -> np.ndarray:
+    """Matrice de _is_in : bboxes1[i] est complètement incluse dans bboxes2[j]."""
+    b1 = _as_bbox_array(bboxes1)[:, None, :]
+    b2 = _as_bbox_array(bboxes2)[None, :, :]
+    return ((b1[..., 0] >= b2[..., 0]) & (b1[..., 1] >= b2[..., 1])
+            & (b1[..., 2] <= b2[..., 2]) & (b1[..., 3] <= b2[..., 3]))
+
+
+def bbox_distance_matrix(bboxes1, bboxes2) -> np.ndarray:
+    """Matrice de bbox_distance."""
+    b1 = _as_bbox_array(bboxes1)[:, None, :]
+    b2 = _as_bbox_array(bboxes2)[None, :, :]
+    x1, y1, x1b, y1b = b1[..., 0], b1[..., 1], b1[..., 2], b1[..., 3]
+    x2, y2, x2b, y2b = b2[..., 0], b2[..., 1], b2[..., 2], b2[..., 3]
+
+    # Positions relatives de bbox_relative_pos
+    left = x2b < x1
+    right = x1b < x2
+    bottom = y2b < y1
+    top = y1b < y2
+
+    # Les conditions sont évaluées dans l'ordre de bbox_distance, la première vraie l'emporte
+    conditions = [top & left, left & bottom, bottom & right, right & top, left, right, bottom, top]
+    # float_power appelle pow comme l'opérateur ** de python, le carré par multiplication pouvant différer au
+    # dernier bit
+    choices = [
+        np.sqrt(np.float_power(x1 - x2b, 2) + np.float_power(y1b - y2, 2)),
+        np.sqrt(np.float_power(x1 - x2b, 2) + np.float_power(y1 - y2b, 2)),
+        np.sqrt(np.float_power(x1b - x2, 2) + np.float_power(y1 - y2b, 2)),
+        np.sqrt(np.float_power(x1b - x2, 2) + np.float_power(y1b - y2, 2)),
+        x1 - x2b,
+        x2 - x1b,
+        y1 - y2b,
+        y2 - y1b,
+    ]
+    return np.select(conditions, choices, default=0.0).astype(np.float64)
+
+
+def get_touching_bbox_indices(bboxes, max_cells_per_side: int = 256) -> list:
+    """Pour chaque bbox, les indices croissants des autres bbox qui la chevauchent ou la touchent, au sens des
+    fonctions ci-dessus (x_right >= x_left et y_bottom >= y_top), trouvés avec une grille uniforme plutôt qu'en
+    comparant tous les couples. Une bbox inversée ne touche aucune bbox.
+
+    Args:
+        bboxes (list): les bbox [x0, y0, x1, y1]
+        max_cells_per_side (int, optional): le nombre maximum de cellules par côté de la zone couverte par les bbox,
+            qui borne le nombre de cellules d'une grande bbox. Par défaut 256.
+
+    Returns:
+        list: la liste des indices des bbox touchées, pour chaque bbox
+    """
+    touching = [[] for _ in bboxes]
+    valid = [i for i, bbox in enumerate(bboxes) if bbox[0] <= bbox[2] and bbox[1] <= bbox[3]]
+    if len(valid) < 2:
+        return touching
+
+    # Des cellules de la taille médiane des bbox, sans descendre sous max_cells_per_side cellules par côté
+    sides = sorted(max(bboxes[i][2] - bboxes[i][0], bboxes[i][3] - bboxes[i][1]) for i in valid)
+    extent = max(max(max(bboxes[i][2] for i in valid) - min(bboxes[i][0] for i in valid),
+                     max(bboxes[i][3] for i in valid) - min(bboxes[i][1] for i in valid)), 0)
+    cell_size = float(max(sides[len(sides) // 2], extent / max_cells_per_side))
+    if cell_size <= 0:
+        cell_size = 1.0
+
+    # Deux bbox qui se touchent ont en commun la cellule du coin (x_left, y_top) de leur intersection
+    cell_ranges = {}
+    grid = {}
+    for i in valid:
+        x0, y0, x1, y1 = bboxes[i][:4]
+        cell_range = (math.floor(x0 / cell_size), math.floor(y0 / cell_size),
+                      math.floor(x1 / cell_size), math.floor(y1 / cell_size))
+        cell_ranges[i] = cell_range
+        for cx in range(cell_range[0], cell_range[2] + 1):
+            for cy in range(cell_range[1], cell_range[3] + 1):
+                grid.setdefault((cx, cy), []).append(i)
+
+    for i in valid:
+        x0, y0, x1, y1 = bboxes[i][:4]
+        cell_range = cell_ranges[i]
+        neighbours = set()
+        for cx in range(cell_range[0], cell_range[2] + 1):
+            for cy in range(cell_range[1], cell_range[3] + 1):
+                neighbours.update(grid[(cx, cy)])
+        neighbours.discard(i)
+        touching[i] = sorted(
+            j for j in neighbours
+            if max(x0, bboxes[j][0]) <= min(x1, bboxes[j][2]) and max(y0, bboxes[j][1]) <= min(y1, bboxes[j][3])
+        )
+    return touching
@@ -5,7 +5,9 @@ import os
 
 from loguru import logger
 
-from panda_vision.config.constants import MODEL_NAME
+from panda_vision.config.constants import (ANALYZE_WINDOW_PAGES_VALUE, LAYOUTREADER_BATCH_SIZE_VALUE,
+                                           MODEL_CACHE_MAX_SIZE_MB_VALUE, MODEL_NAME, PIPELINE_QUEUE_SIZE_VALUE,
+                                           RENDER_PREFETCH_PAGES_VALUE, RENDER_WORKERS_VALUE)
 from panda_vision.libs.commons import parse_bucket_key
 
 # Définition de la constante du nom du fichier de configuration
@@ -77,6 +79,16 @@ def get_local_layoutreader_model_dir():
         return layoutreader_model_dir
 
 
+def get_layoutreader_config():
+    config = read_config()
+    layoutreader_config = config.get('layoutreader-config')
+    if layoutreader_config is None:
+        logger.warning(f"'layoutreader-config' non trouvé dans {CONFIG_FILE_NAME}, utilisation de 'False' par défaut")
+        return json.loads(f'{{"quantize": false, "batch_size": {LAYOUTREADER_BATCH_SIZE_VALUE}}}')
+    else:
+        return layoutreader_config
+
+
 def get_device():
     config = read_config()
     device = config.get('device-mode')
@@ -92,7 +104,7 @@ def get_table_recog_config():
     table_config = config.get('table-config')
     if table_config is None:
         logger.warning(f"'table-config' non trouvé dans {CONFIG_FILE_NAME}, utilisation de 'False' par défaut")
-        return json.loads(f'{{"model": "{MODEL_NAME.RAPID_TABLE}","enable": false, "max_time": 400}}')
+        return json.loads(f'{{"model": "{MODEL_NAME.RAPID_TABLE}","enable": false, "max_time": 400, "isolate": false}}')
     else:
         return table_config
 
@@ -117,5 +129,56 @@ def get_formula_config():
         return formula_config
 
 
+def get_render_config():
+    config = read_config()
+    render_config = config.get('render-config')
+    if render_config is None:
+        logger.warning(f"'render-config' non trouvé dans {CONFIG_FILE_NAME}, utilisation des valeurs par défaut")
+        return json.loads(f'{{"prefetch_pages": {RENDER_PREFETCH_PAGES_VALUE}, '
+                          f'"window_pages": {ANALYZE_WINDOW_PAGES_VALUE}, "workers": {RENDER_WORKERS_VALUE}}}')
+    else:
+        return render_config
+
+
+def get_pipeline_config():
+    config = read_config()
+    pipeline_config = config.get('pipeline-config')
+    if pipeline_config is None:
+        logger.warning(f"'pipeline-config' non trouvé dans {CONFIG_FILE_NAME}, utilisation de 'False' par défaut")
+        return json.loads(f'{{"enable": false, "queue_size": {PIPELINE_QUEUE_SIZE_VALUE}}}')
+    else:
+        return pipeline_config
+
+
+def get_model_cache_config():
+    config = read_config()
+    model_cache_config = config.get('model-cache-config')
+    if model_cache_config is None:
+        logger.warning(f"'model-cache-config' non trouvé dans {CONFIG_FILE_NAME}, utilisation de 'False' par défaut")
+        return json.loads(f'{{"enable": false, "dir": "", "max_size_mb": {MODEL_CACHE_MAX_SIZE_MB_VALUE}, "page_enable": false}}')
+    else:
+        return model_cache_config
+
+
+def get_lazy_load_config():
+    config = read_config()
+    lazy_load_config = config.get('lazy-load-config')
+    if lazy_load_config is None:
+        logger.warning(f"'lazy-load-config' non trouvé dans {CONFIG_FILE_NAME}, utilisation de 'False' par défaut")
+        return json.loads('{"enable": false, "warm_up": false}')
+    else:
+        return lazy_load_config
+
+
+def get_ocr_config():
+    config = read_config()
+    ocr_config = config.get('ocr-config')
+    if ocr_config is None:
+        logger.warning(f"'ocr-config' non trouvé dans {CONFIG_FILE_NAME}, utilisation de 'False' par défaut")
+        return json.loads('{"batch_rec": false}')
+    else:
+        return ocr_config
+
+
 if __name__ == '__main__':
     ak, sk, endpoint = get_s3_config('llm-raw')
@@ -0,0 +1,115 @@
+import json
+import os
+import uuid
+
+from loguru import logger
+
+from panda_vision.config.constants import MODEL_CACHE_MAX_SIZE_MB_VALUE
+from panda_vision.data.data_reader_writer import DataReader, DataWriter
+from panda_vision.libs.hash_utils import compute_md5, compute_sha256
+from panda_vision.libs.version import __version__
+
+
+def compute_config_fingerprint(**kwargs) -> str:
+    """Empreinte des paramètres qui influencent le résultat des modèles.
+
+    Returns:
+        str: le sha256 des paramètres, sérialisés avec des clés triées
+    """
+    kwargs['version'] = __version__
+    return compute_sha256(json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str))
+
+
+class ModelJsonCache:
+    def __init__(self, cache_dir: str = '', max_size_mb: int = MODEL_CACHE_MAX_SIZE_MB_VALUE,
+                 reader: DataReader = None, writer: DataWriter = None):
+        """Cache des model_json adressé par le contenu du pdf et l'empreinte de la configuration des modèles.
+
+        Sur disque local, les entrées sont des fichiers json dont la date de modification est rafraîchie à chaque
+        lecture, les moins récemment utilisées étant supprimées dès que la taille totale dépasse max_size_mb.
+        Avec un reader et un writer, les entrées passent par eux et l'éviction est laissée au stockage.
+
+        Args:
+            cache_dir (str, optional): le répertoire du cache local. Par défaut ~/.cache/panda_vision/model_json.
+            max_size_mb (int, optional): la taille maximale du cache local, en Mo. Par défaut 1024.
+            reader (DataReader, optional): le lecteur des entrées, à fournir avec writer. Par défaut None.
+            writer (DataWriter, optional): l'écrivain des entrées, à fournir avec reader. Par défaut None.
+        """
+        self._reader = reader
+        self._writer = writer
+        self._use_data_rw = reader is not None and writer is not None
+        if not cache_dir:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'panda_vision', 'model_json')
+        self._cache_dir = cache_dir
+        self._max_size = max_size_mb * 1024 * 1024
+        if not self._use_data_rw:
+            os.makedirs(self._cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(pdf_bytes: bytes, fingerprint: str) -> str:
+        return f'{compute_md5(pdf_bytes)}_{fingerprint[:16]}'
+
+    def __local_path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f'{key}.json')
+
+    def get(self, key: str):
+        """Renvoie le model_json mis en cache, None s'il est absent ou illisible."""
+        try:
+            if self._use_data_rw:
+                data = self._reader.read(f'{key}.json')
+            else:
+                path = self.__local_path(key)
+                if not os.path.exists(path):
+                    return None
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # La date de modification sert d'horodatage d'utilisation pour l'éviction
+                os.utime(path)
+            return json.loads(data.decode('utf-8'))
+        except Exception as e:
+            if self._use_data_rw:
+                # Le reader ne permet pas de tester l'existence, une entrée absente lève une exception
+                return None
+            logger.warning(f'entrée de cache {key} illisible: {e}')
+            return None
+
+    def put(self, key: str, model_json: list):
+        data = json.dumps(model_json, ensure_ascii=False).encode('utf-8')
+        if self._use_data_rw:
+            self._writer.write(f'{key}.json', data)
+            return
+        if len(data) > self._max_size:
+            logger.warning(f'model_json de {len(data)} octets plus grand que le cache, non mis en cache')
+            return
+        path = self.__local_path(key)
+        # Écriture dans un fichier temporaire puis renommage, un lecteur concurrent ne voit jamais d'entrée partielle
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.__evict(keep_path=path)
+
+    def __evict(self, keep_path: str):
+        entries = []
+        total_size = 0
+        for file_name in os.listdir(self._cache_dir):
+            if not file_name.endswith('.json'):
+                continue
+            path = os.path.join(self._cache_dir, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self._max_size:
+                break
+            if path == keep_path:
+                continue
+            try:
+                os.remove(path)
+                total_size -= size
+            except FileNotFoundError:
+                pass
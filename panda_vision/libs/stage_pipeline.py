@@ -0,0 +1,99 @@
+import queue
+import threading
+from typing import Callable, Iterable
+
+import torch
+from loguru import logger
+
+_STAGE_END = object()
+
+
+def run_stage_pipeline(items: Iterable, stages: list, queue_size: int = 2, torch_threads: int = 0) -> list:
+    """Fait passer les éléments par une suite d'étages exécutés chacun dans son propre thread.
+
+    Les étages sont reliés par des files bornées à queue_size éléments, de sorte que l'étage k traite l'élément n
+    pendant que l'étage k + 1 traite l'élément n - 1. Chaque étage conserve l'ordre des éléments.
+
+    Args:
+        items (Iterable): les éléments envoyés au premier étage
+        stages (list): liste de (nom, fonction). La fonction reçoit un élément et renvoie la liste des éléments à
+            transmettre à l'étage suivant.
+        queue_size (int, optional): la taille des files entre étages. Par défaut 2.
+        torch_threads (int, optional): le nombre de threads intra-op de torch pendant le pipeline. Ce réglage vaut
+            pour tout le processus et est donc partagé par les étages, il est rétabli à la fin. Par défaut 0, la
+            valeur courante est conservée.
+
+    Returns:
+        list: les éléments produits par le dernier étage, dans l'ordre
+    """
+    stop_event = threading.Event()
+    errors = []
+    stage_queues = [queue.Queue(maxsize=max(queue_size, 1)) for _ in stages]
+    outputs = []
+
+    def put(stage_queue: queue.Queue, item):
+        while not stop_event.is_set():
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(stage_queue: queue.Queue):
+        while not stop_event.is_set():
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STAGE_END
+
+    def run_stage(stage_index: int, name: str, stage_fn: Callable):
+        in_queue = stage_queues[stage_index]
+        out_queue = stage_queues[stage_index + 1] if stage_index + 1 < len(stages) else None
+        try:
+            while True:
+                item = get(in_queue)
+                if item is _STAGE_END:
+                    break
+                for out_item in stage_fn(item):
+                    if out_queue is not None:
+                        put(out_queue, out_item)
+                    else:
+                        outputs.append(out_item)
+        except BaseException as e:
+            logger.error(f"échec de l'étage {name}")
+            errors.append(e)
+            stop_event.set()
+        finally:
+            if out_queue is not None:
+                put(out_queue, _STAGE_END)
+
+    previous_torch_threads = torch.get_num_threads()
+    if torch_threads > 0:
+        torch.set_num_threads(torch_threads)
+
+    threads = []
+    for stage_index, (name, stage_fn) in enumerate(stages):
+        thread = threading.Thread(target=run_stage, args=(stage_index, name, stage_fn),
+                                  name=f'stage-{name}', daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    try:
+        for item in items:
+            if stop_event.is_set():
+                break
+            put(stage_queues[0], item)
+        put(stage_queues[0], _STAGE_END)
+    except BaseException:
+        stop_event.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        if torch_threads > 0:
+            torch.set_num_threads(previous_torch_threads)
+
+    if errors:
+        raise errors[0]
+    return outputs
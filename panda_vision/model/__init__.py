@@ -1,2 +1,3 @@
 __use_inside_model__ = True
 __model_mode__ = "full"
+__cpu_threads__ = 0
@@ -1,13 +1,27 @@
+import copy
+import queue
+import threading
 import time
+from typing import Iterator, Tuple
 
 import fitz
-import numpy as np
 from loguru import logger
 
+from panda_vision.config.constants import ANALYZE_WINDOW_PAGES_VALUE, RENDER_PREFETCH_PAGES_VALUE, \
+    RENDER_WORKERS_VALUE, MODEL_CACHE_MAX_SIZE_MB_VALUE, ADAPTIVE_DPI_TARGET_TEXT_HEIGHT_VALUE, ADAPTIVE_DPI_MIN_VALUE, \
+    ADAPTIVE_DPI_MAX_VALUE, TILE_SIZE_VALUE, TILE_OVERLAP_VALUE
+from panda_vision.data.dpi_policy import MAX_RENDER_SIDE, AdaptiveDpiPolicy
+from panda_vision.data.math_prepass import page_may_contain_math
+from panda_vision.data.text_layer import text_layer_line_bboxes
+from panda_vision.data.render_pool import PageRenderPool
+from panda_vision.data.utils import compute_page_digest, fitz_doc_to_image
 from panda_vision.libs.clean_memory import clean_memory
 from panda_vision.libs.config_reader import get_local_models_dir, get_device, get_table_recog_config, get_layout_config, \
-    get_formula_config
+    get_formula_config, get_ocr_config, get_pipeline_config, get_render_config, \
+    get_lazy_load_config, get_model_cache_config
+from panda_vision.libs.model_cache import ModelJsonCache, compute_config_fingerprint
 from panda_vision.model.model_list import MODEL
+from panda_vision.model.page_tiling import analyze_page_by_tiles, page_needs_tiling
 import panda_vision.model as model_config
 
 
@@ -25,39 +39,81 @@ def remove_duplicates_dicts(lst):
     return unique_dicts
 
 
-def load_images_from_pdf(pdf_bytes: bytes, dpi=200, start_page_id=0, end_page_id=None) -> list:
-    try:
-        from PIL import Image
-    except ImportError:
-        logger.error("Pillow n'est pas installé, veuillez l'installer avec pip.")
-        exit(1)
+def empty_page_dict(page_id: int) -> dict:
+    """Entrée de model_json d'une page hors de la plage analysée."""
+    return {"layout_dets": [], "page_info": {"page_no": page_id, "height": 0, "width": 0}}
 
-    images = []
-    with fitz.open("pdf", pdf_bytes) as doc:
-        pdf_page_num = doc.page_count
-        end_page_id = end_page_id if end_page_id is not None and end_page_id >= 0 else pdf_page_num - 1
-        if end_page_id > pdf_page_num - 1:
-            logger.warning("end_page_id est hors limites, utilisation de la longueur des images")
-            end_page_id = pdf_page_num - 1
 
-        for index in range(0, doc.page_count):
-            if start_page_id <= index <= end_page_id:
-                page = doc[index]
-                mat = fitz.Matrix(dpi / 72, dpi / 72)
-                pm = page.get_pixmap(matrix=mat, alpha=False)
+_RENDER_END = object()
 
-                # Si la largeur ou la hauteur dépasse 4500 après mise à l'échelle, ne pas redimensionner davantage
-                if pm.width > 4500 or pm.height > 4500:
-                    pm = page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
 
-                img = Image.frombytes("RGB", (pm.width, pm.height), pm.samples)
-                img = np.array(img)
-                img_dict = {"img": img, "width": pm.width, "height": pm.height}
-            else:
-                img_dict = {"img": [], "width": 0, "height": 0}
+def iter_images_from_pdf(pdf_bytes: bytes, dpi=200, start_page_id=0, end_page_id=None,
+                         prefetch_pages=RENDER_PREFETCH_PAGES_VALUE, render_workers=0,
+                         page_ids=None, page_dpis=None) -> Iterator[Tuple[int, dict]]:
+    """Rend les pages de start_page_id à end_page_id dans un thread producteur, au plus prefetch_pages pages à
+    l'avance, et les renvoie au fur et à mesure sous la forme (page_id, img_dict).
 
-            images.append(img_dict)
-    return images
+    Seules les pages rendues mais pas encore consommées sont gardées en mémoire, et le rendu se poursuit pendant
+    que le modèle travaille sur les pages précédentes.
+    Avec render_workers > 0, le rendu est réparti sur un pool de processus (voir PageRenderPool).
+    Si page_ids est fourni, seules ces pages sont rendues, dans cet ordre, à la place de la plage.
+    Si page_dpis est fourni, les pages qui y figurent sont rendues au dpi {page_id: dpi} qu'il donne à la place de dpi
+    (voir AdaptiveDpiPolicy).
+    """
+    if page_ids is None:
+        with fitz.open("pdf", pdf_bytes) as doc:
+            pdf_page_num = doc.page_count
+        last_page_id = end_page_id if end_page_id is not None and end_page_id >= 0 else pdf_page_num - 1
+        if last_page_id > pdf_page_num - 1:
+            logger.warning("end_page_id est hors limites, utilisation de la longueur des images")
+            last_page_id = pdf_page_num - 1
+        page_ids = range(start_page_id, last_page_id + 1)
+    page_ids = list(page_ids)
+
+    if render_workers > 0:
+        with PageRenderPool(pdf_bytes, render_workers, dpi=dpi, page_dpis=page_dpis) as render_pool:
+            yield from render_pool.iter_images(page_ids, prefetch_pages)
+        return
+
+    page_queue = queue.Queue(maxsize=max(prefetch_pages, 1))
+    stop_event = threading.Event()
+
+    def put(item):
+        # Ne pas bloquer indéfiniment si le consommateur a abandonné l'itération
+        while not stop_event.is_set():
+            try:
+                page_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def render_pages():
+        try:
+            with fitz.open("pdf", pdf_bytes) as doc:
+                for index in page_ids:
+                    if stop_event.is_set():
+                        return
+                    page = doc[index]
+                    page_dpi = page_dpis.get(index, dpi) if page_dpis is not None else dpi
+                    put((index, fitz_doc_to_image(page, dpi=page_dpi)))
+        except Exception as e:
+            put(e)
+        finally:
+            put(_RENDER_END)
+
+    render_thread = threading.Thread(target=render_pages, name="pdf-page-render", daemon=True)
+    render_thread.start()
+    try:
+        while True:
+            item = page_queue.get()
+            if item is _RENDER_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop_event.set()
+        render_thread.join()
 
 
 class ModelSingleton:
@@ -112,6 +168,17 @@ def custom_model_init(ocr: bool = False, show_log: bool = False, lang=None,
             if table_enable is not None:
                 table_config["enable"] = table_enable
 
+            ocr_config = get_ocr_config()
+
+            pipeline_config = get_pipeline_config()
+            if model_config.__cpu_threads__ > 0:
+                # Budget de threads fixé par le pool de processus, sauf valeur explicite de la configuration
+                for threads_key in ["layout_threads", "ocr_threads", "table_threads"]:
+                    if not pipeline_config.get(threads_key):
+                        pipeline_config[threads_key] = model_config.__cpu_threads__
+
+            lazy_load_config = get_lazy_load_config()
+
             model_input = {
                             "ocr": ocr,
                             "show_log": show_log,
@@ -120,6 +187,9 @@ def custom_model_init(ocr: bool = False, show_log: bool = False, lang=None,
                             "table_config": table_config,
                             "layout_config": layout_config,
                             "formula_config": formula_config,
+                            "ocr_config": ocr_config,
+                            "pipeline_config": pipeline_config,
+                            "lazy_load_config": lazy_load_config,
                             "lang": lang,
             }
 
@@ -138,14 +208,57 @@ def custom_model_init(ocr: bool = False, show_log: bool = False, lang=None,
 
 def doc_analyze(pdf_bytes: bytes, ocr: bool = False, show_log: bool = False,
                 start_page_id=0, end_page_id=None, lang=None,
-                layout_model=None, formula_enable=None, table_enable=None):
+                layout_model=None, formula_enable=None, table_enable=None, model_cache: ModelJsonCache = None):
 
     if lang == "":
         lang = None
 
-    model_manager = ModelSingleton()
-    custom_model = model_manager.get_model(ocr, show_log, lang, layout_model, formula_enable, table_enable)
-
+    render_config = get_render_config()
+    prefetch_pages = render_config.get("prefetch_pages", RENDER_PREFETCH_PAGES_VALUE)
+    window_pages = max(render_config.get("window_pages", ANALYZE_WINDOW_PAGES_VALUE), 1)
+    render_workers = render_config.get("workers", RENDER_WORKERS_VALUE)
+    # Les pages trop grandes sont analysées par tuiles à pleine résolution au lieu d'être rendues en 72 dpi
+    apply_tiling = render_config.get("tiling", False)
+    tile_size = render_config.get("tile_size", TILE_SIZE_VALUE)
+    tile_overlap = render_config.get("tile_overlap", TILE_OVERLAP_VALUE)
+    dpi_policy = None
+    if render_config.get("adaptive_dpi", False):
+        dpi_policy = AdaptiveDpiPolicy(
+            target_text_height=render_config.get("target_text_height", ADAPTIVE_DPI_TARGET_TEXT_HEIGHT_VALUE),
+            min_dpi=render_config.get("min_dpi", ADAPTIVE_DPI_MIN_VALUE),
+            max_dpi=render_config.get("max_dpi", ADAPTIVE_DPI_MAX_VALUE),
+            max_side=None if apply_tiling else MAX_RENDER_SIDE,
+        )
+
+    # Le cache est consulté avant l'initialisation des modèles, un document déjà analysé n'en charge aucun
+    model_cache_config = get_model_cache_config()
+    if model_cache is None and model_cache_config.get("enable", False):
+        model_cache = ModelJsonCache(model_cache_config.get("dir", ""),
+                                     model_cache_config.get("max_size_mb", MODEL_CACHE_MAX_SIZE_MB_VALUE))
+    apply_page_cache = model_cache is not None and model_cache_config.get("page_enable", False)
+    cache_key = None
+    model_fingerprint = None
+    if model_cache is not None:
+        model_fingerprint = compute_config_fingerprint(
+            model_mode=model_config.__model_mode__, ocr=ocr, lang=lang, layout_model=layout_model,
+            formula_enable=formula_enable, table_enable=table_enable,
+            layout_config=get_layout_config(), formula_config=get_formula_config(),
+            table_config=get_table_recog_config(), ocr_config=get_ocr_config(),
+            dpi_policy=vars(dpi_policy) if dpi_policy is not None else None,
+            tiling=[tile_size, tile_overlap] if apply_tiling else None,
+        )
+        cache_key = ModelJsonCache.make_key(pdf_bytes, compute_config_fingerprint(
+            model_fingerprint=model_fingerprint, start_page_id=start_page_id, end_page_id=end_page_id,
+        ))
+        model_json = model_cache.get(cache_key)
+        if model_json is not None:
+            logger.info(f"model_json trouvé dans le cache: {cache_key}")
+            return model_json
+
+    # Résultats par page, issus du cache de pages ou de l'analyse
+    page_results = {}
+    # Pages à analyser, une seule par empreinte, les pages identiques du document reprenant son résultat
+    page_keys = {}
     with fitz.open("pdf", pdf_bytes) as doc:
         pdf_page_num = doc.page_count
         end_page_id = end_page_id if end_page_id is not None and end_page_id >= 0 else pdf_page_num - 1
@@ -153,24 +266,125 @@ def doc_analyze(pdf_bytes: bytes, ocr: bool = False, show_log: bool = False,
             logger.warning("end_page_id est hors limites, utilisation de la longueur des images")
             end_page_id = pdf_page_num - 1
 
-    images = load_images_from_pdf(pdf_bytes, start_page_id=start_page_id, end_page_id=end_page_id)
+        if apply_page_cache:
+            digest_memo = {}
+            for page_id in range(start_page_id, end_page_id + 1):
+                page_key = f"page_{compute_page_digest(doc, page_id, digest_memo)}_{model_fingerprint[:16]}"
+                page_keys.setdefault(page_key, []).append(page_id)
+            for page_key, page_ids in page_keys.items():
+                page_result = model_cache.get(page_key)
+                if page_result is not None:
+                    for page_id in page_ids:
+                        page_results[page_id] = page_result
+    page_ids_to_analyze = [page_ids[0] for page_key, page_ids in page_keys.items()
+                           if page_ids[0] not in page_results] \
+        if apply_page_cache else list(range(start_page_id, end_page_id + 1))
+    if apply_page_cache:
+        logger.info(f"cache de pages: {len(page_results)} pages trouvées, {len(page_ids_to_analyze)} pages à analyser")
+
+    # Dpi choisi une seule fois par page, repris pour le choix des tuiles, le rendu et l'analyse par tuiles
+    page_dpis = {}
+    if dpi_policy is not None and len(page_ids_to_analyze) > 0:
+        with fitz.open("pdf", pdf_bytes) as doc:
+            page_dpis = {page_id: dpi_policy(doc[page_id]) for page_id in page_ids_to_analyze}
+
+    tiled_page_ids = []
+    if apply_tiling:
+        with fitz.open("pdf", pdf_bytes) as doc:
+            tiled_page_ids = [
+                page_id for page_id in page_ids_to_analyze
+                if page_needs_tiling(doc[page_id], page_dpis.get(page_id, 200))
+            ]
+        if len(tiled_page_ids) > 0:
+            logger.info(f"pages analysées par tuiles: {tiled_page_ids}")
+
+    # Pré-passes sur la couche texte : la détection des formules est sautée sur les pages qui n'en contiennent pas
+    # et, hors OCR, les lignes de la couche texte remplacent la détection de texte sur les pages où elle est fiable
+    formula_flags = {}
+    text_line_bboxes = {}
+    formula_config = get_formula_config()
+    apply_math_prepass = formula_enable is not False and formula_config.get("enable", True) \
+        and not formula_config.get("force_mfd", False)
+    apply_text_layer_det = not ocr and get_ocr_config().get("text_layer_det", False)
+    if (apply_math_prepass or apply_text_layer_det) and len(page_ids_to_analyze) > 0:
+        with fitz.open("pdf", pdf_bytes) as doc:
+            for page_id in page_ids_to_analyze:
+                if apply_math_prepass:
+                    formula_flags[page_id] = page_may_contain_math(doc[page_id])
+                # Les pages analysées par tuiles gardent la détection
+                if apply_text_layer_det and page_id not in tiled_page_ids:
+                    text_line_bboxes[page_id] = text_layer_line_bboxes(doc[page_id])
+        if apply_math_prepass:
+            logger.info(f"pré-passe des formules: {sum(formula_flags.values())}/{len(formula_flags)} pages "
+                        f"passent par la détection des formules")
+        if apply_text_layer_det:
+            text_layer_count = sum(line_bboxes is not None for line_bboxes in text_line_bboxes.values())
+            logger.info(f"détection de texte depuis la couche texte: {text_layer_count}/{len(page_ids_to_analyze)} "
+                        f"pages")
 
-    model_json = []
     doc_analyze_start = time.time()
 
-    for index, img_dict in enumerate(images):
-        img = img_dict["img"]
-        page_width = img_dict["width"]
-        page_height = img_dict["height"]
-        if start_page_id <= index <= end_page_id:
-            page_start = time.time()
-            result = custom_model(img)
-            logger.info(f'-----page_id : {index}, temps total de la page: {round(time.time() - page_start, 2)}-----')
+    if len(page_ids_to_analyze) > 0:
+        model_manager = ModelSingleton()
+        custom_model = model_manager.get_model(ocr, show_log, lang, layout_model, formula_enable, table_enable)
+
+        try:
+            # Les pages sont rendues juste avant d'être consommées et analysées par fenêtres de window_pages pages,
+            # le modèle regroupant la détection de mise en page et la reconnaissance des formules de chaque fenêtre.
+            # Les lots mfr ne dépassent donc pas une fenêtre, ce qui borne la mémoire au lieu de garder tout le
+            # document
+            window = []
+
+            def analyze_window():
+                results = custom_model.batch_analyze([img_dict["img"] for _, img_dict in window],
+                                                     [formula_flags.get(page_id, True) for page_id, _ in window],
+                                                     [text_line_bboxes.get(page_id) for page_id, _ in window])
+                for (page_id, img_dict), result in zip(window, results):
+                    page_results[page_id] = {
+                        "layout_dets": result,
+                        "page_info": {"page_no": page_id, "height": img_dict["height"], "width": img_dict["width"]},
+                    }
+                window.clear()
+
+            page_ids_to_render = [page_id for page_id in page_ids_to_analyze if page_id not in tiled_page_ids]
+            for page_id, img_dict in iter_images_from_pdf(pdf_bytes, prefetch_pages=prefetch_pages,
+                                                          render_workers=render_workers, page_ids=page_ids_to_render,
+                                                          page_dpis=page_dpis):
+                window.append((page_id, img_dict))
+                if len(window) >= window_pages:
+                    analyze_window()
+            if len(window) > 0:
+                analyze_window()
+
+            if len(tiled_page_ids) > 0:
+                with fitz.open("pdf", pdf_bytes) as doc:
+                    for page_id in tiled_page_ids:
+                        page_results[page_id] = analyze_page_by_tiles(custom_model, doc[page_id],
+                                                                      page_dpis.get(page_id, 200), tile_size,
+                                                                      tile_overlap, window_pages,
+                                                                      formula_flag=formula_flags.get(page_id, True))
+        finally:
+            # Le processus de tableau isolé ne survit pas au document, même interrompu
+            custom_model.close()
+
+    if apply_page_cache:
+        for page_key, page_ids in page_keys.items():
+            if page_ids[0] in page_ids_to_analyze:
+                model_cache.put(page_key, page_results[page_ids[0]])
+                for page_id in page_ids[1:]:
+                    page_results[page_id] = page_results[page_ids[0]]
+
+    model_json = []
+    for page_id in range(0, pdf_page_num):
+        if page_id in page_results:
+            page_result = page_results[page_id]
+            if page_result["page_info"]["page_no"] != page_id:
+                # Résultat partagé avec une page identique, chaque page reçoit sa copie avec son propre numéro
+                page_result = copy.deepcopy(page_result)
+                page_result["page_info"]["page_no"] = page_id
+            model_json.append(page_result)
         else:
-            result = []
-        page_info = {"page_no": index, "height": page_height, "width": page_width}
-        page_dict = {"layout_dets": result, "page_info": page_info}
-        model_json.append(page_dict)
+            model_json.append(empty_page_dict(page_id))
 
     gc_start = time.time()
     clean_memory()
@@ -178,8 +392,11 @@ def doc_analyze(pdf_bytes: bytes, ocr: bool = False, show_log: bool = False,
     logger.info(f"temps gc: {gc_time}")
 
     doc_analyze_time = round(time.time() - doc_analyze_start, 2)
-    doc_analyze_speed = round( (end_page_id + 1 - start_page_id) / doc_analyze_time, 2)
+    doc_analyze_speed = round((end_page_id + 1 - start_page_id) / max(doc_analyze_time, 0.01), 2)
     logger.info(f"temps d'analyse du document: {round(time.time() - doc_analyze_start, 2)},"
                 f" vitesse: {doc_analyze_speed} pages/seconde")
 
+    if model_cache is not None:
+        model_cache.put(cache_key, model_json)
+
     return model_json
@@ -1,18 +1,25 @@
 import enum
 
+import numpy as np
+
 from panda_vision.config.model_block_type import ModelBlockTypeEnum
 from panda_vision.config.ocr_content_type import CategoryId, ContentType
 from panda_vision.data.dataset import Dataset
-from panda_vision.libs.boxbase import (_is_in, _is_part_overlap, bbox_distance,
-                                    bbox_relative_pos, box_area, calculate_iou,
+from panda_vision.libs.boxbase import (_is_in, _is_in_matrix, _is_part_overlap,
+                                    bbox_distance, bbox_distance_matrix,
+                                    bbox_relative_pos, box_area,
+                                    calculate_iou_matrix,
                                     calculate_overlap_area_in_bbox1_area_ratio,
                                     get_overlap_area)
 from panda_vision.libs.coordinate_transform import get_scale_ratio
 from panda_vision.libs.local_math import float_gt
-from panda_vision.pre_proc.remove_bbox_overlap import _remove_overlap_between_bbox
+from panda_vision.pre_proc.remove_bbox_overlap import \
+    _remove_overlap_between_bbox_matrix
 
 CAPATION_OVERLAP_AREA_RATIO = 0.6
 MERGE_BOX_OVERLAP_AREA_RATIO = 1.1
+# Catégories des blocs de mise en page, de title (0) à formula_caption (9)
+LAYOUT_BLOCK_CATEGORY_IDS = {0, 1, 2, 3, 4, 5, 6, 7, 8, 9}
 
 
 class PosRelationEnum(enum.Enum):
@@ -70,41 +77,41 @@ class MagicModel:
 
     def __fix_by_remove_high_iou_and_low_confidence(self):
         for model_page_info in self.__model_list:
-            need_remove_list = []
             layout_dets = model_page_info['layout_dets']
-            for layout_det1 in layout_dets:
-                for layout_det2 in layout_dets:
-                    if layout_det1 == layout_det2:
-                        continue
-                    if layout_det1['category_id'] in [
-                        0,
-                        1,
-                        2,
-                        3,
-                        4,
-                        5,
-                        6,
-                        7,
-                        8,
-                        9,
-                    ] and layout_det2['category_id'] in [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]:
-                        if (
-                            calculate_iou(layout_det1['bbox'], layout_det2['bbox'])
-                            > 0.9
-                        ):
-                            if layout_det1['score'] < layout_det2['score']:
-                                layout_det_need_remove = layout_det1
-                            else:
-                                layout_det_need_remove = layout_det2
+            # Seuls les blocs de mise en page sont comparés entre eux, les spans ocr et formules sont laissés de côté
+            candidates = [
+                layout_det for layout_det in layout_dets if layout_det['category_id'] in LAYOUT_BLOCK_CATEGORY_IDS
+            ]
+            if len(candidates) < 2:
+                continue
+            candidate_bboxes = [layout_det['bbox'] for layout_det in candidates]
+            scores = np.array([layout_det['score'] for layout_det in candidates])
+            # Un bloc est supprimé dès qu'un autre bloc le recouvre avec un iou > 0.9 et un score au moins égal, même
+            # si ce bloc est lui-même supprimé : à score égal, les deux blocs sont supprimés
+            remove_mask = (calculate_iou_matrix(candidate_bboxes, candidate_bboxes) > 0.9) & (
+                scores[:, None] <= scores[None, :]
+            )
+            need_remove_indexes = set()
+            for i, j in zip(*np.nonzero(remove_mask)):
+                # Un bloc n'est pas comparé aux blocs égaux, dont lui-même
+                if i not in need_remove_indexes and candidates[i] != candidates[j]:
+                    need_remove_indexes.add(i)
+            if len(need_remove_indexes) == 0:
+                continue
 
-                            if layout_det_need_remove not in need_remove_list:
-                                need_remove_list.append(layout_det_need_remove)
-                        else:
-                            continue
-                    else:
-                        continue
-            for need_remove in need_remove_list:
-                layout_dets.remove(need_remove)
+            # Une seule suppression par groupe de blocs égaux, celle de sa première occurrence
+            removed_by_key = {}
+            need_remove_ids = set()
+            for i in sorted(need_remove_indexes):
+                layout_det = candidates[i]
+                same_key_removed = removed_by_key.setdefault(
+                    (tuple(layout_det['bbox']), layout_det['score']), []
+                )
+                if any(layout_det == removed for removed in same_key_removed):
+                    continue
+                same_key_removed.append(layout_det)
+                need_remove_ids.add(id(layout_det))
+            layout_dets[:] = [layout_det for layout_det in layout_dets if id(layout_det) not in need_remove_ids]
 
     def __init__(self, model_list: list, docs: Dataset):
         self.__model_list = model_list
@@ -116,6 +123,25 @@ class MagicModel:
         """Supprimer les données avec un iou élevé (>0.9) et une confiance plus faible"""
         self.__fix_by_remove_high_iou_and_low_confidence()
         self.__fix_footnote()
+        """Indexer une fois pour toutes les données du modèle par page et par catégorie"""
+        self.__build_category_index()
+
+    def __build_category_index(self):
+        # Par position dans model_list, les layout_dets de chaque catégorie dans leur ordre d'origine
+        self.__category_index = []
+        # Positions dans model_list des pages de chaque page_no
+        self.__page_positions = {}
+        for position, page_dict in enumerate(self.__model_list):
+            page_category_index = {}
+            for item in page_dict.get('layout_dets', []):
+                page_category_index.setdefault(item.get('category_id', -1), []).append(item)
+            self.__category_index.append(page_category_index)
+            page_number = page_dict.get('page_info', {}).get('page_no', -1)
+            self.__page_positions.setdefault(page_number, []).append(position)
+
+    def __get_dets_by_category(self, page_no: int, category_id) -> list:
+        """Les layout_dets d'une catégorie de la page à la position page_no de model_list."""
+        return self.__category_index[page_no].get(category_id, [])
 
     def _bbox_distance(self, bbox1, bbox2):
         left, right, bottom, top = bbox_relative_pos(bbox1, bbox2)
@@ -199,13 +225,12 @@ class MagicModel:
 
     def __reduct_overlap(self, bboxes):
         N = len(bboxes)
-        keep = [True] * N
-        for i in range(N):
-            for j in range(N):
-                if i == j:
-                    continue
-                if _is_in(bboxes[i]['bbox'], bboxes[j]['bbox']):
-                    keep[i] = False
+        if N == 0:
+            return []
+        bbox_list = [bbox['bbox'] for bbox in bboxes]
+        is_in = _is_in_matrix(bbox_list, bbox_list)
+        np.fill_diagonal(is_in, False)
+        keep = ~is_in.any(axis=1)
         return [bboxes[i] for i in range(N) if keep[i]]
 
     def __tie_up_category_by_distance(
@@ -236,16 +261,12 @@ class MagicModel:
             ]
             ratio = 0
 
-            other_objects = list(
-                map(
-                    lambda x: {'bbox': x['bbox'], 'score': x['score']},
-                    filter(
-                        lambda x: x['category_id']
-                        not in (object_category_id, subject_category_id),
-                        self.__model_list[page_no]['layout_dets'],
-                    ),
-                )
-            )
+            other_objects = [
+                {'bbox': x['bbox'], 'score': x['score']}
+                for category_id, dets in self.__category_index[page_no].items()
+                if category_id not in (object_category_id, subject_category_id)
+                for x in dets
+            ]
             for other_object in other_objects:
                 ratio = max(
                     ratio,
@@ -309,10 +330,7 @@ class MagicModel:
             list(
                 map(
                     lambda x: {'bbox': x['bbox'], 'score': x['score']},
-                    filter(
-                        lambda x: x['category_id'] == subject_category_id,
-                        self.__model_list[page_no]['layout_dets'],
-                    ),
+                    self.__get_dets_by_category(page_no, subject_category_id),
                 )
             )
         )
@@ -321,10 +339,7 @@ class MagicModel:
             list(
                 map(
                     lambda x: {'bbox': x['bbox'], 'score': x['score']},
-                    filter(
-                        lambda x: x['category_id'] == object_category_id,
-                        self.__model_list[page_no]['layout_dets'],
-                    ),
+                    self.__get_dets_by_category(page_no, object_category_id),
                 )
             )
         )
@@ -620,10 +635,7 @@ class MagicModel:
             list(
                 map(
                     lambda x: {'bbox': x['bbox'], 'score': x['score']},
-                    filter(
-                        lambda x: x['category_id'] == subject_category_id,
-                        self.__model_list[page_no]['layout_dets'],
-                    ),
+                    self.__get_dets_by_category(page_no, subject_category_id),
                 )
             )
         )
@@ -632,10 +644,7 @@ class MagicModel:
             list(
                 map(
                     lambda x: {'bbox': x['bbox'], 'score': x['score']},
-                    filter(
-                        lambda x: x['category_id'] == object_category_id,
-                        self.__model_list[page_no]['layout_dets'],
-                    ),
+                    self.__get_dets_by_category(page_no, object_category_id),
                 )
             )
         )
@@ -653,55 +662,33 @@ class MagicModel:
             'right': [[-1, float('inf')]] * M,
         }
 
+        if M > 0 and len(subjects) > 0:
+            obj_bboxes = [obj['bbox'] for obj in objects]
+            sub_bboxes = [sub['bbox'] for sub in subjects]
+            # Positions relatives calculées sur les bbox dont le chevauchement a été retiré
+            bboxes1, bboxes2 = _remove_overlap_between_bbox_matrix(obj_bboxes, sub_bboxes)
+            flags = {
+                'left': bboxes2[..., 2] < bboxes1[..., 0],
+                'right': bboxes1[..., 2] < bboxes2[..., 0],
+                'bottom': bboxes2[..., 3] < bboxes1[..., 1],
+                'top': bboxes1[..., 3] < bboxes2[..., 1],
+            }
+            single_direction = sum(flag.astype(int) for flag in flags.values()) <= 1
+            dis = bbox_distance_matrix(obj_bboxes, sub_bboxes)
+            for direction, flag in flags.items():
+                # argmin garde le premier sujet à égalité de distance, comme la recherche séquentielle
+                dis_in_direction = np.where(flag & single_direction, dis, np.inf)
+                nearest = np.argmin(dis_in_direction, axis=1)
+                nearest_dis = dis_in_direction[np.arange(M), nearest]
+                for i in np.flatnonzero(nearest_dis != np.inf):
+                    dis_by_directions[direction][i] = [int(nearest[i]), float(nearest_dis[i])]
+
         for i, obj in enumerate(objects):
             l_x_axis, l_y_axis = (
                 obj['bbox'][2] - obj['bbox'][0],
                 obj['bbox'][3] - obj['bbox'][1],
             )
             axis_unit = min(l_x_axis, l_y_axis)
-            for j, sub in enumerate(subjects):
-
-                bbox1, bbox2, _ = _remove_overlap_between_bbox(
-                    objects[i]['bbox'], subjects[j]['bbox']
-                )
-                left, right, bottom, top = bbox_relative_pos(bbox1, bbox2)
-                flags = [left, right, bottom, top]
-                if sum([1 if v else 0 for v in flags]) > 1:
-                    continue
-
-                if left:
-                    if dis_by_directions['left'][i][1] > bbox_distance(
-                        obj['bbox'], sub['bbox']
-                    ):
-                        dis_by_directions['left'][i] = [
-                            j,
-                            bbox_distance(obj['bbox'], sub['bbox']),
-                        ]
-                if right:
-                    if dis_by_directions['right'][i][1] > bbox_distance(
-                        obj['bbox'], sub['bbox']
-                    ):
-                        dis_by_directions['right'][i] = [
-                            j,
-                            bbox_distance(obj['bbox'], sub['bbox']),
-                        ]
-                if bottom:
-                    if dis_by_directions['bottom'][i][1] > bbox_distance(
-                        obj['bbox'], sub['bbox']
-                    ):
-                        dis_by_directions['bottom'][i] = [
-                            j,
-                            bbox_distance(obj['bbox'], sub['bbox']),
-                        ]
-                if top:
-                    if dis_by_directions['top'][i][1] > bbox_distance(
-                        obj['bbox'], sub['bbox']
-                    ):
-                        dis_by_directions['top'][i] = [
-                            j,
-                            bbox_distance(obj['bbox'], sub['bbox']),
-                        ]
-
             if (
                 dis_by_directions['top'][i][1] != float('inf')
                 and dis_by_directions['bottom'][i][1] != float('inf')
@@ -849,14 +836,14 @@ class MagicModel:
         with_footnotes = self.__tie_up_category_by_distance_v2(
             page_no, 3, CategoryId.ImageFootnote, PosRelationEnum.ALL
         )
+        footnotes_by_sub_idx = {v['sub_idx']: v for v in with_footnotes}
         ret = []
         for v in with_captions:
             record = {
                 'image_body': v['sub_bbox'],
                 'image_caption_list': v['obj_bboxes'],
             }
-            filter_idx = v['sub_idx']
-            d = next(filter(lambda x: x['sub_idx'] == filter_idx, with_footnotes))
+            d = footnotes_by_sub_idx[v['sub_idx']]
             record['image_footnote_list'] = d['obj_bboxes']
             ret.append(record)
         return ret
@@ -868,14 +855,14 @@ class MagicModel:
         with_footnotes = self.__tie_up_category_by_distance_v2(
             page_no, 5, 7, PosRelationEnum.ALL
         )
+        footnotes_by_sub_idx = {v['sub_idx']: v for v in with_footnotes}
         ret = []
         for v in with_captions:
             record = {
                 'table_body': v['sub_bbox'],
                 'table_caption_list': v['obj_bboxes'],
             }
-            filter_idx = v['sub_idx']
-            d = next(filter(lambda x: x['sub_idx'] == filter_idx, with_footnotes))
+            d = footnotes_by_sub_idx[v['sub_idx']]
             record['table_footnote_list'] = d['obj_bboxes']
             ret.append(record)
         return ret
@@ -1023,24 +1010,15 @@ class MagicModel:
         self, type: int, page_no: int, extra_col: list[str] = []
     ) -> list:
         blocks = []
-        for page_dict in self.__model_list:
-            layout_dets = page_dict.get('layout_dets', [])
-            page_info = page_dict.get('page_info', {})
-            page_number = page_info.get('page_no', -1)
-            if page_no != page_number:
-                continue
-            for item in layout_dets:
-                category_id = item.get('category_id', -1)
-                bbox = item.get('bbox', None)
-
-                if category_id == type:
-                    block = {
-                        'bbox': bbox,
-                        'score': item.get('score'),
-                    }
-                    for col in extra_col:
-                        block[col] = item.get(col, None)
-                    blocks.append(block)
+        for position in self.__page_positions.get(page_no, []):
+            for item in self.__category_index[position].get(type, []):
+                block = {
+                    'bbox': item.get('bbox', None),
+                    'score': item.get('score'),
+                }
+                for col in extra_col:
+                    block[col] = item.get(col, None)
+                blocks.append(block)
         return blocks
 
     def get_model_list(self, page_no):
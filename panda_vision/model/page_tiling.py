@@ -0,0 +1,151 @@
+import fitz
+import numpy as np
+
+from panda_vision.data.dpi_policy import MAX_RENDER_SIDE
+
+
+def page_needs_tiling(page, dpi: int, max_side: int = MAX_RENDER_SIDE) -> bool:
+    """Indique si la page rendue à dpi dépasse max_side pixels, taille au-delà de laquelle fitz_doc_to_image
+    repasse en 72 dpi."""
+    scale = dpi / 72
+    return page.rect.width * scale > max_side or page.rect.height * scale > max_side
+
+
+def compute_tile_rects(width: int, height: int, tile_size: int, overlap: int) -> list:
+    """Découpe une page de width x height pixels en tuiles d'au plus tile_size pixels de côté qui se recouvrent
+    d'au moins overlap pixels.
+
+    Returns:
+        list: les tuiles [x0, y0, x1, y1] en pixels de la page
+    """
+    def axis_starts(length):
+        if length <= tile_size:
+            return [0]
+        stride = max(tile_size - overlap, 1)
+        count = int(np.ceil((length - tile_size) / stride)) + 1
+        # Les tuiles sont réparties régulièrement, la dernière s'arrêtant au bord de la page
+        return [int(round(i * (length - tile_size) / (count - 1))) for i in range(count)]
+
+    return [
+        [x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)]
+        for y0 in axis_starts(height)
+        for x0 in axis_starts(width)
+    ]
+
+
+def render_tile(page, dpi: int, tile_rect: list) -> np.ndarray:
+    """Rend une tuile de la page à dpi, seule la zone de la tuile étant rastérisée.
+
+    Returns:
+        np.ndarray: l'image RGB de la tuile
+    """
+    scale = dpi / 72
+    x0, y0, x1, y1 = tile_rect
+    clip = fitz.Rect(x0 / scale, y0 / scale, x1 / scale, y1 / scale) + (page.rect.x0, page.rect.y0,
+                                                                          page.rect.x0, page.rect.y0)
+    pm = page.get_pixmap(matrix=fitz.Matrix(scale, scale), clip=clip, alpha=False)
+    return np.frombuffer(pm.samples, dtype=np.uint8).reshape(pm.height, pm.width, 3).copy()
+
+
+def analyze_page_by_tiles(custom_model, page, dpi: int, tile_size: int, overlap: int, batch_size: int,
+                          formula_flag: bool = True) -> dict:
+    """Analyse une page trop grande pour être rendue entière à dpi en la découpant en tuiles qui se recouvrent.
+
+    Les tuiles sont rendues et analysées par lots de batch_size, la mémoire restant bornée par lot de tuiles, puis
+    leurs détections sont fusionnées dans le repère de la page.
+
+    Args:
+        custom_model: le modèle d'analyse, qui fournit batch_analyze
+        page (fitz.Page): la page
+        dpi (int): le dpi de rendu
+        tile_size (int): le côté maximum d'une tuile, en pixels
+        overlap (int): le recouvrement minimum entre tuiles voisines, en pixels
+        batch_size (int): le nombre de tuiles analysées ensemble
+        formula_flag (bool, optional): False si la détection des formules peut être sautée. Par défaut True.
+
+    Returns:
+        dict: l'entrée de model_json de la page, page_info donnant la taille de la page entière à dpi
+    """
+    scale = dpi / 72
+    width, height = int(round(page.rect.width * scale)), int(round(page.rect.height * scale))
+    tile_rects = compute_tile_rects(width, height, tile_size, overlap)
+    tiles_layout_dets = []
+    for start in range(0, len(tile_rects), max(batch_size, 1)):
+        batch_rects = tile_rects[start: start + max(batch_size, 1)]
+        tiles_layout_dets.extend(custom_model.batch_analyze([render_tile(page, dpi, rect) for rect in batch_rects],
+                                                            [formula_flag] * len(batch_rects)))
+    layout_dets = merge_tile_layout_dets(tiles_layout_dets, tile_rects, width, height)
+    return {'layout_dets': layout_dets, 'page_info': {'page_no': page.number, 'height': height, 'width': width}}
+
+
+def _bbox_overlap_ratio(bbox1, bbox2) -> float:
+    """Surface de l'intersection rapportée à la plus petite des deux boîtes."""
+    x0, y0 = max(bbox1[0], bbox2[0]), max(bbox1[1], bbox2[1])
+    x1, y1 = min(bbox1[2], bbox2[2]), min(bbox1[3], bbox2[3])
+    if x1 <= x0 or y1 <= y0:
+        return 0.0
+    min_area = min((bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1]), (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1]))
+    return (x1 - x0) * (y1 - y0) / max(min_area, 1e-6)
+
+
+def merge_tile_layout_dets(tiles_layout_dets: list, tile_rects: list, page_width: int, page_height: int,
+                           overlap_threshold: float = 0.8, edge_margin: int = 4) -> list:
+    """Ramène les détections des tuiles dans le repère de la page et supprime les doublons des zones de
+    recouvrement.
+
+    Seules les détections qui touchent une zone couverte par plusieurs tuiles peuvent avoir un doublon. Parmi
+    elles, une NMS par catégorie garde en priorité les boîtes qui ne sont pas coupées par un bord intérieur de
+    leur tuile, puis les meilleurs scores, et supprime les boîtes de même catégorie contenues à plus de
+    overlap_threshold dans une boîte gardée.
+
+    Args:
+        tiles_layout_dets (list): les layout_dets de chaque tuile, en pixels de la tuile
+        tile_rects (list): les tuiles [x0, y0, x1, y1] en pixels de la page
+        page_width (int): la largeur de la page en pixels
+        page_height (int): la hauteur de la page en pixels
+        overlap_threshold (float, optional): le taux de recouvrement de suppression. Par défaut 0.8.
+        edge_margin (int, optional): la distance en pixels à un bord intérieur en dessous de laquelle une boîte
+            est considérée comme coupée. Par défaut 4.
+
+    Returns:
+        list: les layout_dets de la page
+    """
+    shared_zones = []
+    for i in range(len(tile_rects)):
+        for j in range(i + 1, len(tile_rects)):
+            a, b = tile_rects[i], tile_rects[j]
+            zone = [max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])]
+            if zone[2] > zone[0] and zone[3] > zone[1]:
+                shared_zones.append(zone)
+
+    layout_dets = []
+    candidates = []
+    for tile_layout_dets, (tx0, ty0, tx1, ty1) in zip(tiles_layout_dets, tile_rects):
+        for layout_det in tile_layout_dets:
+            poly = layout_det['poly']
+            layout_det['poly'] = [p + (tx0 if i % 2 == 0 else ty0) for i, p in enumerate(poly)]
+            bbox = [layout_det['poly'][0], layout_det['poly'][1], layout_det['poly'][4], layout_det['poly'][5]]
+            in_shared_zone = any(
+                bbox[0] < zone[2] and zone[0] < bbox[2] and bbox[1] < zone[3] and zone[1] < bbox[3]
+                for zone in shared_zones
+            )
+            if not in_shared_zone:
+                layout_dets.append(layout_det)
+                continue
+            truncated = (
+                (tx0 > 0 and bbox[0] - tx0 <= edge_margin)
+                or (ty0 > 0 and bbox[1] - ty0 <= edge_margin)
+                or (tx1 < page_width and tx1 - bbox[2] <= edge_margin)
+                or (ty1 < page_height and ty1 - bbox[3] <= edge_margin)
+            )
+            candidates.append((truncated, -layout_det.get('score', 0), bbox, layout_det))
+
+    candidates.sort(key=lambda candidate: (candidate[0], candidate[1]))
+    kept_bboxes = {}
+    for _, _, bbox, layout_det in candidates:
+        category_kept_bboxes = kept_bboxes.setdefault(layout_det['category_id'], [])
+        if any(_bbox_overlap_ratio(bbox, kept_bbox) >= overlap_threshold for kept_bbox in category_kept_bboxes):
+            continue
+        category_kept_bboxes.append(bbox)
+        layout_dets.append(layout_det)
+    return layout_dets
@@ -3,11 +3,8 @@ import os
 import time
 
 import cv2
-import numpy as np
-import torch
 import yaml
 from loguru import logger
-from PIL import Image
 
 os.environ['NO_ALBUMENTATIONS_UPDATE'] = '1'  # désactiver la vérification des mises à jour albumentations
 os.environ['YOLO_VERBOSE'] = 'False'  # désactiver le logger yolo
@@ -21,12 +18,17 @@ except ImportError:
     pass
 
 from panda_vision.config.constants import *
+from panda_vision.libs.stage_pipeline import run_stage_pipeline
 from panda_vision.model.model_list import AtomicModel
-from panda_vision.model.sub_modules.model_init import AtomModelSingleton
+from panda_vision.model.sub_modules.model_init import (
+    AtomModelSingleton, warm_up_atom_models)
 from panda_vision.model.sub_modules.model_utils import (
     clean_vram, crop_img, get_res_list_from_layout_res)
 from panda_vision.model.sub_modules.ocr.paddleocr.ocr_utils import (
-    get_adjusted_mfdetrec_res, get_ocr_result_list)
+    assign_det_boxes_to_regions, bbox_to_points, get_adjusted_mfdetrec_res, get_ocr_result_list,
+    merge_det_boxes, update_det_boxes)
+from panda_vision.model.sub_modules.table.table_worker import (
+    TableWorker, table_model_predict)
 
 
 class CustomPEKModel:
@@ -54,6 +56,9 @@ class CustomPEKModel:
         self.layout_model_name = self.layout_config.get(
             'model', MODEL_NAME.DocLayout_YOLO
         )
+        self.layout_batch_size = self.layout_config.get('batch_size', LAYOUT_BATCH_SIZE_VALUE)
+        # 'torch' ou 'onnx', seul DocLayout-YOLO peut être exécuté par onnxruntime
+        self.layout_backend = self.layout_config.get('backend', 'torch')
 
         # Configuration des formules
         self.formula_config = kwargs.get('formula_config')
@@ -64,17 +69,39 @@ class CustomPEKModel:
             'mfr_model', MODEL_NAME.UniMerNet_v2_Small
         )
         self.apply_formula = self.formula_config.get('enable', True)
+        self.mfd_batch_size = self.formula_config.get('mfd_batch_size', MFD_BATCH_SIZE_VALUE)
+        self.mfr_batch_size = self.formula_config.get('mfr_batch_size', MFR_BATCH_SIZE_VALUE)
+        self.mfd_backend = self.formula_config.get('mfd_backend', 'torch')
+        # Quantification int8 d'UniMERNet, sur cpu uniquement
+        self.mfr_quantize = self.formula_config.get('mfr_quantize', False)
 
         # Configuration des tableaux
         self.table_config = kwargs.get('table_config')
         self.apply_table = self.table_config.get('enable', False)
         self.table_max_time = self.table_config.get('max_time', TABLE_MAX_TIME_VALUE)
         self.table_model_name = self.table_config.get('model', MODEL_NAME.RAPID_TABLE)
+        # Isoler le modèle de tableau dans un processus pour interrompre les tableaux trop longs
+        self.apply_table_isolate = self.table_config.get('isolate', False)
+
+        # Configuration du pipeline entre étages
+        self.pipeline_config = kwargs.get('pipeline_config') or {}
+        self.apply_pipeline = self.pipeline_config.get('enable', False)
 
         # Configuration OCR
         self.apply_ocr = ocr
+        self.ocr_config = kwargs.get('ocr_config') or {}
+        self.apply_batch_rec = self.ocr_config.get('batch_rec', False)
+        self.apply_page_det = self.ocr_config.get('page_det', False)
+        # La page entière ne doit pas être réduite à la taille limite par défaut de paddle (960)
+        default_det_limit_side_len = PAGE_DET_LIMIT_SIDE_LEN_VALUE if self.apply_page_det else 0
+        self.ocr_det_limit_side_len = self.ocr_config.get('det_limit_side_len', default_det_limit_side_len)
         self.lang = kwargs.get('lang', None)
 
+        # Chargement paresseux des modèles atomiques
+        self.lazy_load_config = kwargs.get('lazy_load_config') or {}
+        self.apply_lazy_load = self.lazy_load_config.get('enable', False)
+        self.apply_warm_up = self.lazy_load_config.get('warm_up', False)
+
         logger.info(
             'Initialisation DocAnalysis, cela peut prendre du temps, modèle de mise en page: {}, formules: {}, ocr: {}, '
             'tableaux: {}, modèle de tableau: {}, langue: {}'.format(
@@ -100,6 +127,7 @@ class CustomPEKModel:
         if self.apply_formula:
             # Initialiser le modèle de détection des formules
             self.mfd_model = atom_model_manager.get_atom_model(
+                lazy=self.apply_lazy_load,
                 atom_model_name=AtomicModel.MFD,
                 mfd_weights=str(
                     os.path.join(
@@ -107,6 +135,8 @@ class CustomPEKModel:
                     )
                 ),
                 device=self.device,
+                backend=self.mfd_backend,
+                onnx_cache_dir=os.path.join(models_dir, 'onnx'),
             )
 
             # Initialiser le modèle d'analyse des formules
@@ -115,15 +145,20 @@ class CustomPEKModel:
             )
             mfr_cfg_path = str(os.path.join(model_config_dir, 'UniMERNet', 'demo.yaml'))
             self.mfr_model = atom_model_manager.get_atom_model(
+                lazy=self.apply_lazy_load,
                 atom_model_name=AtomicModel.MFR,
                 mfr_weight_dir=mfr_weight_dir,
                 mfr_cfg_path=mfr_cfg_path,
                 device=self.device,
+                mfr_quantize=self.mfr_quantize,
             )
 
         # Initialisation du modèle de mise en page
+        if self.layout_model_name == MODEL_NAME.LAYOUTLMv3 and self.layout_backend == 'onnx':
+            logger.warning('le backend onnx n\'est disponible que pour doclayout_yolo, layoutlmv3 reste en torch')
         if self.layout_model_name == MODEL_NAME.LAYOUTLMv3:
             self.layout_model = atom_model_manager.get_atom_model(
+                lazy=self.apply_lazy_load,
                 atom_model_name=AtomicModel.Layout,
                 layout_model_name=MODEL_NAME.LAYOUTLMv3,
                 layout_weights=str(
@@ -140,6 +175,7 @@ class CustomPEKModel:
             )
         elif self.layout_model_name == MODEL_NAME.DocLayout_YOLO:
             self.layout_model = atom_model_manager.get_atom_model(
+                lazy=self.apply_lazy_load,
                 atom_model_name=AtomicModel.Layout,
                 layout_model_name=MODEL_NAME.DocLayout_YOLO,
                 doclayout_yolo_weights=str(
@@ -148,18 +184,34 @@ class CustomPEKModel:
                     )
                 ),
                 device=self.device,
+                backend=self.layout_backend,
+                onnx_cache_dir=os.path.join(models_dir, 'onnx'),
             )
         # Initialisation OCR
         self.ocr_model = atom_model_manager.get_atom_model(
+            lazy=self.apply_lazy_load,
             atom_model_name=AtomicModel.OCR,
             ocr_show_log=show_log,
             det_db_box_thresh=0.3,
-            lang=self.lang
+            lang=self.lang,
+            ocr_cpu_threads=self.pipeline_config.get('ocr_threads', 0),
+            ocr_rec_batch_num=self.ocr_config.get('rec_batch_num', 0),
+            ocr_det_limit_side_len=self.ocr_det_limit_side_len,
         )
         # Initialisation du modèle de tableau
-        if self.apply_table:
+        self.table_worker = None
+        if self.apply_table and self.apply_table_isolate:
+            table_model_dir = self.configs['weights'][self.table_model_name]
+            self.table_worker = TableWorker(
+                self.table_model_name,
+                str(os.path.join(models_dir, table_model_dir)),
+                self.table_max_time,
+                self.device,
+            )
+        elif self.apply_table:
             table_model_dir = self.configs['weights'][self.table_model_name]
             self.table_model = atom_model_manager.get_atom_model(
+                lazy=self.apply_lazy_load,
                 atom_model_name=AtomicModel.Table,
                 table_model_name=self.table_model_name,
                 table_model_path=str(os.path.join(models_dir, table_model_dir)),
@@ -167,36 +219,162 @@ class CustomPEKModel:
                 device=self.device,
             )
 
+        # Thread de préchauffage, attendu avant la première analyse : les prédicteurs ultralytics d'une même instance
+        # ne supportent pas deux inférences concurrentes
+        self.warm_up_thread = None
+        if self.apply_lazy_load and self.apply_warm_up:
+            self.warm_up_thread = warm_up_atom_models([
+                self.layout_model,
+                getattr(self, 'mfd_model', None),
+                self.ocr_model,
+                getattr(self, 'mfr_model', None),
+                getattr(self, 'table_model', None),
+            ])
+
         logger.info('Initialisation DocAnalysis terminée!')
 
     def __call__(self, image):
+        return self.batch_analyze([image])[0]
+
+    def close(self):
+        """Arrête le processus de tableau isolé, il sera redémarré au prochain tableau."""
+        if self.table_worker is not None:
+            self.table_worker.close()
+
+    def batch_analyze(self, images: list, formula_flags: list = None, text_line_bboxes: list = None) -> list:
+        """Analyse plusieurs pages, la détection de mise en page étant faite par lots de layout_batch_size pages
+        et la reconnaissance des formules regroupée sur l'ensemble des pages reçues.
+
+        doc_analyze appelle batch_analyze par fenêtres de render-config.window_pages pages (16 par défaut) : les lots
+        mfr sont formés sur une fenêtre et non sur tout le document, ce qui borne la mémoire des images et des
+        découpes de formules gardées en même temps.
+
+        Args:
+            images (list): les images des pages, tableaux numpy RGB
+            formula_flags (list, optional): pour chaque page, False si la détection des formules peut être sautée.
+                Par défaut None, toutes les pages passent par la détection des formules.
+            text_line_bboxes (list, optional): pour chaque page, les boîtes des lignes de la couche texte en fraction
+                de la taille de la page, qui remplacent la détection de texte hors OCR, ou None pour garder la
+                détection. Par défaut None.
+
+        Returns:
+            list: la liste layout_res de chaque page, dans l'ordre des images
+        """
+        if len(images) == 0:
+            return []
+        if self.warm_up_thread is not None:
+            self.warm_up_thread.join()
+            self.warm_up_thread = None
+        if formula_flags is None:
+            formula_flags = [True] * len(images)
+        if text_line_bboxes is None:
+            text_line_bboxes = [None] * len(images)
+
+        if self.apply_pipeline and len(images) > 1:
+            return self.__pipeline_analyze(images, formula_flags, text_line_bboxes)
+
+        images_layout_res = self.__layout_and_formula_predict(images, formula_flags)
 
-        # Détection de la mise en page
+        # En mode batch_rec, les lignes de texte de toutes les pages sont reconnues ensemble à la fin
+        rec_pool = [] if self.apply_ocr and self.apply_batch_rec else None
+        results = []
+        for index, (image, layout_res) in enumerate(zip(images, images_layout_res)):
+            page_start = time.time()
+            results.append(self.__analyze_page(image, layout_res, rec_pool, text_line_bboxes[index]))
+            logger.info(f'-----index du lot : {index}, temps ocr et tableaux de la page: '
+                        f'{round(time.time() - page_start, 2)}-----')
+        if rec_pool is not None:
+            self.__rec_pool_predict(rec_pool)
+        return results
+
+    def __pipeline_analyze(self, images: list, formula_flags: list, text_line_bboxes: list) -> list:
+        """Analyse les pages en faisant se chevaucher les étages : pendant que les pages du lot suivant passent par
+        la mise en page et les formules, la page courante est en OCR et la précédente en reconnaissance de tableaux.
+
+        La reconnaissance des formules est alors regroupée par lot de layout_batch_size pages.
+        """
+        def layout_stage(start):
+            batch_images = images[start: start + self.layout_batch_size]
+            batch_formula_flags = formula_flags[start: start + self.layout_batch_size]
+            images_layout_res = self.__layout_and_formula_predict(batch_images, batch_formula_flags)
+            return [(start + offset, layout_res) for offset, layout_res in enumerate(images_layout_res)]
+
+        def ocr_stage(item):
+            index, layout_res = item
+            page_bgr = cv2.cvtColor(images[index], cv2.COLOR_RGB2BGR)
+            clean_vram(self.device, vram_threshold=8)
+            ocr_res_list, table_res_list, single_page_mfdetrec_res = get_res_list_from_layout_res(layout_res)
+            rec_pool = [] if self.apply_ocr and self.apply_batch_rec else None
+            self.__ocr_predict(page_bgr, ocr_res_list, single_page_mfdetrec_res, layout_res, rec_pool,
+                               text_line_bboxes[index])
+            if rec_pool is not None:
+                self.__rec_pool_predict(rec_pool)
+            return [(index, table_res_list, layout_res)]
+
+        def table_stage(item):
+            index, table_res_list, layout_res = item
+            if self.apply_table:
+                self.__table_predict(images[index], table_res_list)
+            return [layout_res]
+
+        stages = [('layout', layout_stage), ('ocr', ocr_stage), ('table', table_stage)]
+        # Le nombre de threads de torch vaut pour tout le processus, les étages torch se partagent le plus grand de
+        # leurs budgets. L'OCR paddle est borné par ocr_threads, passé à la création de ses prédicteurs
+        torch_threads = max(self.pipeline_config.get('layout_threads', 0), self.pipeline_config.get('table_threads', 0))
+        pipeline_start = time.time()
+        results = run_stage_pipeline(
+            range(0, len(images), self.layout_batch_size), stages,
+            queue_size=self.pipeline_config.get('queue_size', PIPELINE_QUEUE_SIZE_VALUE), torch_threads=torch_threads,
+        )
+        logger.info(f'temps du pipeline: {round(time.time() - pipeline_start, 2)}, nombre de pages: {len(images)}')
+        return results
+
+    def __layout_and_formula_predict(self, images: list, formula_flags: list) -> list:
+
+        # Détection de la mise en page par lots
         layout_start = time.time()
-        layout_res = []
+        images_layout_res = []
         if self.layout_model_name == MODEL_NAME.LAYOUTLMv3:
             # layoutlmv3
-            layout_res = self.layout_model(image, ignore_catids=[])
+            images_layout_res = self.layout_model.batch_predict(images, self.layout_batch_size, ignore_catids=[])
         elif self.layout_model_name == MODEL_NAME.DocLayout_YOLO:
             # doclayout_yolo
-            layout_res = self.layout_model.predict(image)
+            images_layout_res = self.layout_model.batch_predict(images, self.layout_batch_size)
         layout_cost = round(time.time() - layout_start, 2)
-        logger.info(f'temps de détection de mise en page: {layout_cost}')
-
-        pil_img = Image.fromarray(image)
+        logger.info(f'temps de détection de mise en page: {layout_cost}, nombre de pages: {len(images)}, '
+                    f'taille de lot: {self.layout_batch_size}')
 
-        if self.apply_formula:
+        # Seules les pages dont la couche texte laisse supposer des formules passent par mfd et mfr
+        formula_indexes = [index for index, formula_flag in enumerate(formula_flags) if formula_flag]
+        if self.apply_formula and len(formula_indexes) > 0:
+            formula_images = [images[index] for index in formula_indexes]
             # Détection des formules
             mfd_start = time.time()
-            mfd_res = self.mfd_model.predict(image)
-            logger.info(f'temps mfd: {round(time.time() - mfd_start, 2)}')
+            images_mfd_res = self.mfd_model.batch_predict(formula_images, self.mfd_batch_size)
+            logger.info(f'temps mfd: {round(time.time() - mfd_start, 2)}, '
+                        f'pages sans formule sautées: {len(images) - len(formula_indexes)}')
 
-            # Reconnaissance des formules
+            # Reconnaissance des formules de toutes les pages reçues, regroupées par taille
             mfr_start = time.time()
-            formula_list = self.mfr_model.predict(mfd_res, image)
-            layout_res.extend(formula_list)
+            if any(len(mfd_res.boxes) > 0 for mfd_res in images_mfd_res):
+                images_formula_list = self.mfr_model.batch_predict(images_mfd_res, formula_images,
+                                                                   self.mfr_batch_size)
+            else:
+                # Aucune formule détectée, le modèle mfr n'a pas besoin d'être chargé
+                images_formula_list = [[] for _ in formula_images]
+            formula_count = 0
+            for index, formula_list in zip(formula_indexes, images_formula_list):
+                images_layout_res[index].extend(formula_list)
+                formula_count += len(formula_list)
             mfr_cost = round(time.time() - mfr_start, 2)
-            logger.info(f'nombre de formules: {len(formula_list)}, temps mfr: {mfr_cost}')
+            logger.info(f'nombre de formules: {formula_count}, temps mfr: {mfr_cost}')
+
+        return images_layout_res
+
+    def __analyze_page(self, image, layout_res, rec_pool=None, text_line_bboxes=None):
+
+        # Conversion en BGR une seule fois par page, les découpes OCR et tableaux sont prises dessus
+        page_bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
 
         # Nettoyage de la mémoire vidéo
         clean_vram(self.device, vram_threshold=8)
@@ -207,14 +385,36 @@ class CustomPEKModel:
         )
 
         # Reconnaissance OCR
+        self.__ocr_predict(page_bgr, ocr_res_list, single_page_mfdetrec_res, layout_res, rec_pool, text_line_bboxes)
+
+        # Reconnaissance des tableaux
+        if self.apply_table:
+            self.__table_predict(image, table_res_list)
+
+        return layout_res
+
+    def __ocr_predict(self, page_bgr, ocr_res_list, single_page_mfdetrec_res, layout_res, rec_pool=None,
+                      text_line_bboxes=None):
+        if not self.apply_ocr and text_line_bboxes is not None:
+            return self.__text_layer_det_predict(page_bgr, ocr_res_list, single_page_mfdetrec_res, layout_res,
+                                                 text_line_bboxes)
+        if self.apply_page_det:
+            return self.__page_det_ocr_predict(page_bgr, ocr_res_list, single_page_mfdetrec_res, layout_res, rec_pool)
+
         ocr_start = time.time()
         # Traiter chaque zone nécessitant un traitement OCR
         for res in ocr_res_list:
-            new_image, useful_list = crop_img(res, pil_img, crop_paste_x=50, crop_paste_y=50)
+            new_image, useful_list = crop_img(res, page_bgr, crop_paste_x=50, crop_paste_y=50)
             adjusted_mfdetrec_res = get_adjusted_mfdetrec_res(single_page_mfdetrec_res, useful_list)
 
             # Reconnaissance OCR
-            new_image = cv2.cvtColor(np.asarray(new_image), cv2.COLOR_RGB2BGR)
+            if rec_pool is not None:
+                # Détection seule, les lignes découpées sont reconnues plus tard avec celles des autres zones
+                dt_boxes = self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res, rec=False)[0]
+                if dt_boxes:
+                    img_crop_list = self.ocr_model.crop_text_lines(new_image, dt_boxes)
+                    rec_pool.append((layout_res, useful_list, dt_boxes, img_crop_list))
+                continue
             if self.apply_ocr:
                 ocr_res = self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res)[0]
             else:
@@ -231,44 +431,122 @@ class CustomPEKModel:
         else:
             logger.info(f"temps de détection: {ocr_cost}")
 
-        # Reconnaissance des tableaux
-        if self.apply_table:
-            table_start = time.time()
-            for res in table_res_list:
-                new_image, _ = crop_img(res, pil_img)
-                single_table_start_time = time.time()
-                html_code = None
-                if self.table_model_name == MODEL_NAME.STRUCT_EQTABLE:
-                    with torch.no_grad():
-                        table_result = self.table_model.predict(new_image, 'html')
-                        if len(table_result) > 0:
-                            html_code = table_result[0]
-                elif self.table_model_name == MODEL_NAME.TABLE_MASTER:
-                    html_code = self.table_model.img2html(new_image)
-                elif self.table_model_name == MODEL_NAME.RAPID_TABLE:
-                    html_code, table_cell_bboxes, elapse = self.table_model.predict(
-                        new_image
-                    )
+    def __page_det_ocr_predict(self, page_bgr, ocr_res_list, single_page_mfdetrec_res, layout_res, rec_pool=None):
+        """Détection de texte faite une seule fois sur la page entière, les boîtes étant ensuite réparties entre les
+        zones OCR puis fusionnées et découpées autour des formules zone par zone."""
+        ocr_start = time.time()
+        if len(ocr_res_list) == 0:
+            return
+        dt_boxes = self.ocr_model.det_page(page_bgr)
+
+        region_bboxes = [
+            [int(res['poly'][0]), int(res['poly'][1]), int(res['poly'][4]), int(res['poly'][5])]
+            for res in ocr_res_list
+        ]
+        region_boxes_list = assign_det_boxes_to_regions(dt_boxes, region_bboxes)
+
+        # Les boîtes sont déjà en coordonnées de la page
+        useful_list = [0, 0, 0, 0, page_bgr.shape[1], page_bgr.shape[0], page_bgr.shape[1], page_bgr.shape[0]]
+        page_rec_pool = rec_pool if rec_pool is not None else []
+        for region_boxes in region_boxes_list:
+            region_boxes = self.ocr_model.split_region_boxes(region_boxes, single_page_mfdetrec_res)
+            if len(region_boxes) == 0:
+                continue
+            region_boxes = [box.tolist() for box in region_boxes]
+            if self.apply_ocr:
+                img_crop_list = self.ocr_model.crop_text_lines(page_bgr, region_boxes)
+                page_rec_pool.append((layout_res, useful_list, region_boxes, img_crop_list))
+            else:
+                layout_res.extend(get_ocr_result_list(region_boxes, useful_list))
+        if rec_pool is None:
+            self.__rec_pool_predict(page_rec_pool)
+
+        ocr_cost = round(time.time() - ocr_start, 2)
+        if self.apply_ocr:
+            logger.info(f"temps ocr (détection sur la page): {ocr_cost}")
+        else:
+            logger.info(f"temps de détection sur la page: {ocr_cost}")
+
+    def __text_layer_det_predict(self, page_bgr, ocr_res_list, single_page_mfdetrec_res, layout_res,
+                                 text_line_bboxes):
+        """Les lignes de la couche texte du pdf remplacent la détection de texte : elles sont réparties entre les
+        zones OCR puis fusionnées et découpées autour des formules comme les boîtes du détecteur, le texte des
+        spans étant ensuite repris des caractères du pdf."""
+        det_start = time.time()
+        if len(ocr_res_list) == 0:
+            return
+        page_height, page_width = page_bgr.shape[:2]
+        dt_boxes = [
+            bbox_to_points([x0 * page_width, y0 * page_height, x1 * page_width, y1 * page_height])
+            for x0, y0, x1, y1 in text_line_bboxes
+        ]
+        region_bboxes = [
+            [int(res['poly'][0]), int(res['poly'][1]), int(res['poly'][4]), int(res['poly'][5])]
+            for res in ocr_res_list
+        ]
+        region_boxes_list = assign_det_boxes_to_regions(dt_boxes, region_bboxes)
+
+        # Les boîtes sont déjà en coordonnées de la page
+        useful_list = [0, 0, 0, 0, page_width, page_height, page_width, page_height]
+        for region_boxes in region_boxes_list:
+            if len(region_boxes) == 0:
+                continue
+            region_boxes = merge_det_boxes(region_boxes)
+            if single_page_mfdetrec_res:
+                region_boxes = update_det_boxes(region_boxes, single_page_mfdetrec_res)
+            layout_res.extend(get_ocr_result_list([box.tolist() for box in region_boxes], useful_list))
+        logger.info(f"temps de détection depuis la couche texte: {round(time.time() - det_start, 2)}")
+
+    def __rec_pool_predict(self, rec_pool):
+        """Reconnaît en un seul appel les lignes de texte découpées de toutes les zones, puis rattache les résultats
+        à la page de chaque zone via get_ocr_result_list."""
+        if len(rec_pool) == 0:
+            return
+        rec_start = time.time()
+        img_crop_list = [img_crop for _, _, _, region_crop_list in rec_pool for img_crop in region_crop_list]
+        rec_res = self.ocr_model.rec_text_lines(img_crop_list)
+
+        offset = 0
+        for layout_res, useful_list, dt_boxes, region_crop_list in rec_pool:
+            region_rec_res = rec_res[offset: offset + len(region_crop_list)]
+            offset += len(region_crop_list)
+            ocr_res = [
+                [box, rec_result] for box, rec_result in zip(dt_boxes, region_rec_res)
+                if rec_result[1] >= self.ocr_model.drop_score
+            ]
+            if ocr_res:
+                layout_res.extend(get_ocr_result_list(ocr_res, useful_list))
+        logger.info(f'nombre de lignes reconnues: {len(img_crop_list)}, temps de reconnaissance groupée: '
+                    f'{round(time.time() - rec_start, 2)}')
+
+    def __table_predict(self, image, table_res_list):
+        table_start = time.time()
+        for res in table_res_list:
+            single_table_start_time = time.time()
+            new_image, _ = crop_img(res, image)
+            if self.table_worker is not None:
+                # Budget strict, None (tableau conservé en image) si le processus a été interrompu
+                html_code = self.table_worker.predict(new_image)
+            else:
+                html_code = table_model_predict(self.table_model, self.table_model_name, new_image)
                 run_time = time.time() - single_table_start_time
                 if run_time > self.table_max_time:
                     logger.warning(
                         f'le traitement de reconnaissance de tableau dépasse le temps maximum {self.table_max_time}s'
                     )
-                # Vérifier si le retour est normal
-                if html_code:
-                    expected_ending = html_code.strip().endswith(
-                        '</html>'
-                    ) or html_code.strip().endswith('</table>')
-                    if expected_ending:
-                        res['html'] = html_code
-                    else:
-                        logger.warning(
-                            'échec du traitement de reconnaissance de tableau, fin HTML attendue non trouvée'
-                        )
+            # Vérifier si le retour est normal
+            if html_code:
+                expected_ending = html_code.strip().endswith(
+                    '</html>'
+                ) or html_code.strip().endswith('</table>')
+                if expected_ending:
+                    res['html'] = html_code
                 else:
                     logger.warning(
-                        'échec du traitement de reconnaissance de tableau, pas de retour html'
+                        'échec du traitement de reconnaissance de tableau, fin HTML attendue non trouvée'
                     )
-            logger.info(f'temps de tableau: {round(time.time() - table_start, 2)}')
-
-        return layout_res
+            else:
+                logger.warning(
+                    'échec du traitement de reconnaissance de tableau, pas de retour html'
+                )
+        logger.info(f'temps de tableau: {round(time.time() - table_start, 2)}')
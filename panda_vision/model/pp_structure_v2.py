@@ -108,3 +108,11 @@ class CustomPaddleModel:
             result.extend(spans)
 
         return result
+
+    def batch_analyze(self, images: list, formula_flags: list = None, text_line_bboxes: list = None) -> list:
+        # PPStructure ne sait traiter qu'une image à la fois, et ne détecte pas les formules
+        return [self(img) for img in images]
+
+    def close(self):
+        # Aucun processus à arrêter, présent pour l'interface commune avec CustomPEKModel
+        pass
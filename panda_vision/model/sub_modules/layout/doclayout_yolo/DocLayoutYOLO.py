@@ -1,14 +1,34 @@
 from doclayout_yolo import YOLOv10
 
+from panda_vision.model.sub_modules.model_utils import export_onnx_cached
+
 
 class DocLayoutYOLOModel(object):
-    def __init__(self, weight, device):
-        self.model = YOLOv10(weight)
+    def __init__(self, weight, device, backend='torch', onnx_cache_dir=None):
+        if backend == 'onnx':
+            # Le graphe exporté est exécuté par onnxruntime, pré et post-traitement restant ceux de YOLOv10
+            weight = export_onnx_cached(weight, YOLOv10, 1024, onnx_cache_dir)
+            self.model = YOLOv10(weight, task='detect')
+        else:
+            self.model = YOLOv10(weight)
         self.device = device
 
     def predict(self, image):
-        layout_res = []
         doclayout_yolo_res = self.model.predict(image, imgsz=1024, conf=0.25, iou=0.45, verbose=True, device=self.device)[0]
+        return self.__parse_res(doclayout_yolo_res)
+
+    def batch_predict(self, images: list, batch_size: int) -> list:
+        images_layout_res = []
+        for index in range(0, len(images), batch_size):
+            doclayout_yolo_res = self.model.predict(images[index: index + batch_size], imgsz=1024, conf=0.25,
+                                                    iou=0.45, verbose=False, device=self.device)
+            for image_res in doclayout_yolo_res:
+                images_layout_res.append(self.__parse_res(image_res))
+        return images_layout_res
+
+    @staticmethod
+    def __parse_res(doclayout_yolo_res):
+        layout_res = []
         for xyxy, conf, cla in zip(doclayout_yolo_res.boxes.xyxy.cpu(), doclayout_yolo_res.boxes.conf.cpu(),
                                    doclayout_yolo_res.boxes.cls.cpu()):
             xmin, ymin, xmax, ymax = [int(p.item()) for p in xyxy]
@@ -18,4 +38,4 @@ class DocLayoutYOLOModel(object):
                 'score': round(float(conf.item()), 3),
             }
             layout_res.append(new_item)
-        return layout_res
\ No newline at end of file
+        return layout_res
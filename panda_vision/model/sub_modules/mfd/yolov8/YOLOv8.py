@@ -1,12 +1,26 @@
 from ultralytics import YOLO
 
+from panda_vision.model.sub_modules.model_utils import export_onnx_cached
+
 
 class YOLOv8MFDModel(object):
-    def __init__(self, weight, device='cpu'):
-        self.mfd_model = YOLO(weight)
+    def __init__(self, weight, device='cpu', backend='torch', onnx_cache_dir=None):
+        if backend == 'onnx':
+            # Le graphe exporté est exécuté par onnxruntime, les résultats gardent le format ultralytics
+            weight = export_onnx_cached(weight, YOLO, 1888, onnx_cache_dir)
+            self.mfd_model = YOLO(weight, task='detect')
+        else:
+            self.mfd_model = YOLO(weight)
         self.device = device
 
     def predict(self, image):
         mfd_res = self.mfd_model.predict(image, imgsz=1888, conf=0.25, iou=0.45, verbose=True, device=self.device)[0]
         return mfd_res
 
+    def batch_predict(self, images: list, batch_size: int) -> list:
+        images_mfd_res = []
+        for index in range(0, len(images), batch_size):
+            mfd_res = self.mfd_model.predict(images[index: index + batch_size], imgsz=1888, conf=0.25, iou=0.45,
+                                             verbose=False, device=self.device)
+            images_mfd_res.extend(mfd_res)
+        return images_mfd_res
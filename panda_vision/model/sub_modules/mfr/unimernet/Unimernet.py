@@ -1,15 +1,24 @@
 import os
 import argparse
+import difflib
 import re
 
+import cv2
+import numpy as np
 from PIL import Image
 import torch
 from torch.utils.data import Dataset, DataLoader
 from torchvision import transforms
+from loguru import logger
 from unimernet.common.config import Config
 import unimernet.tasks as tasks
 from unimernet.processors import load_processor
 
+from panda_vision.model.sub_modules.quantization import quantize_linear_dynamic
+
+# Formules synthétiques de la vérification de la quantification
+_QUANTIZATION_CHECK_FORMULAS = ['x + y = 1', 'a2 + b2 = c2', 'f(x) = 3x - 7', 'E = mc2', 'n! > 2n']
+
 
 class MathDataset(Dataset):
     def __init__(self, image_paths, transform=None):
@@ -49,8 +58,15 @@ def latex_rm_whitespace(s: str):
     return s
 
 
+def _render_formula_image(text: str) -> Image.Image:
+    (width, height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 1.2, 2)
+    image = np.full((height + baseline + 20, width + 20, 3), 255, dtype=np.uint8)
+    cv2.putText(image, text, (10, height + 10), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    return Image.fromarray(image)
+
+
 class UnimernetModel(object):
-    def __init__(self, weight_dir, cfg_path, _device_='cpu'):
+    def __init__(self, weight_dir, cfg_path, _device_='cpu', quantize=False):
 
         args = argparse.Namespace(cfg_path=cfg_path, options=None)
         cfg = Config(args)
@@ -64,35 +80,69 @@ class UnimernetModel(object):
         self.model.eval()
         vis_processor = load_processor('formula_image_eval', cfg.config.datasets.formula_rec_eval.vis_processor.eval)
         self.mfr_transform = transforms.Compose([vis_processor, ])
+        if quantize:
+            if str(_device_).startswith('cpu'):
+                self.model = quantize_linear_dynamic(self.model, 'unimernet', weight_dir,
+                                                     accuracy_check=self.__quantization_agreement)
+            else:
+                logger.warning('la quantification int8 de unimernet ne concerne que le cpu, ignorée')
+
+    def __quantization_agreement(self, fp32_model, int8_model) -> float:
+        """Similarité moyenne entre les LaTeX décodés en fp32 et en int8 sur des formules synthétiques."""
+        images = torch.stack([self.mfr_transform(_render_formula_image(text)) for text in _QUANTIZATION_CHECK_FORMULAS])
+        fp32_res = fp32_model.generate({'image': images})['pred_str']
+        int8_res = int8_model.generate({'image': images})['pred_str']
+        return float(np.mean([difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(fp32_res, int8_res)]))
 
     def predict(self, mfd_res, image):
+        return self.batch_predict([mfd_res], [image])[0]
 
-        formula_list = []
+    def batch_predict(self, images_mfd_res: list, images: list, batch_size: int = 64) -> list:
+        """Reconnaît en une seule passe les formules de toutes les pages.
+
+        Les découpes de toutes les pages sont triées par surface puis par rapport largeur/hauteur, de sorte que
+        chaque lot regroupe des formules de taille proche, puis les LaTeX sont redistribués page par page.
+        """
+        images_formula_list = []
         mf_image_list = []
-        for xyxy, conf, cla in zip(mfd_res.boxes.xyxy.cpu(), mfd_res.boxes.conf.cpu(), mfd_res.boxes.cls.cpu()):
-            xmin, ymin, xmax, ymax = [int(p.item()) for p in xyxy]
-            new_item = {
-                'category_id': 13 + int(cla.item()),
-                'poly': [xmin, ymin, xmax, ymin, xmax, ymax, xmin, ymax],
-                'score': round(float(conf.item()), 2),
-                'latex': '',
-            }
-            formula_list.append(new_item)
-            pil_img = Image.fromarray(image)
-            bbox_img = pil_img.crop((xmin, ymin, xmax, ymax))
-            mf_image_list.append(bbox_img)
-
-        dataset = MathDataset(mf_image_list, transform=self.mfr_transform)
-        dataloader = DataLoader(dataset, batch_size=64, num_workers=0)
+        backfill_list = []
+        for mfd_res, image in zip(images_mfd_res, images):
+            formula_list = []
+            for xyxy, conf, cla in zip(mfd_res.boxes.xyxy.cpu(), mfd_res.boxes.conf.cpu(), mfd_res.boxes.cls.cpu()):
+                xmin, ymin, xmax, ymax = [int(p.item()) for p in xyxy]
+                new_item = {
+                    'category_id': 13 + int(cla.item()),
+                    'poly': [xmin, ymin, xmax, ymin, xmax, ymax, xmin, ymax],
+                    'score': round(float(conf.item()), 2),
+                    'latex': '',
+                }
+                formula_list.append(new_item)
+                backfill_list.append(new_item)
+                # Seule la zone de la formule est convertie en image PIL, pas la page entière
+                bbox_img = Image.fromarray(image[ymin:ymax, xmin:xmax])
+                mf_image_list.append(bbox_img)
+            images_formula_list.append(formula_list)
+
+        if len(mf_image_list) == 0:
+            return images_formula_list
+
+        # Regrouper les formules de taille proche pour limiter le remplissage et la longueur de décodage par lot
+        sorted_indexes = sorted(
+            range(len(mf_image_list)),
+            key=lambda i: (mf_image_list[i].width * mf_image_list[i].height,
+                           mf_image_list[i].width / max(mf_image_list[i].height, 1))
+        )
+        sorted_images = [mf_image_list[i] for i in sorted_indexes]
+
+        dataset = MathDataset(sorted_images, transform=self.mfr_transform)
+        dataloader = DataLoader(dataset, batch_size=batch_size, num_workers=0)
         mfr_res = []
         for mf_img in dataloader:
             mf_img = mf_img.to(self.device)
             with torch.no_grad():
                 output = self.model.generate({'image': mf_img})
             mfr_res.extend(output['pred_str'])
-        for res, latex in zip(formula_list, mfr_res):
-            res['latex'] = latex_rm_whitespace(latex)
-        return formula_list
-
-
 
+        for index, latex in zip(sorted_indexes, mfr_res):
+            backfill_list[index]['latex'] = latex_rm_whitespace(latex)
+        return images_formula_list
@@ -1,3 +1,7 @@
+import threading
+import time
+
+import numpy as np
 from loguru import logger
 
 from panda_vision.config.constants import MODEL_NAME
@@ -37,13 +41,13 @@ def table_model_init(table_model_type, model_path, max_time, _device_='cpu'):
     return table_model
 
 
-def mfd_model_init(weight, device='cpu'):
-    mfd_model = YOLOv8MFDModel(weight, device)
+def mfd_model_init(weight, device='cpu', backend='torch', onnx_cache_dir=None):
+    mfd_model = YOLOv8MFDModel(weight, device, backend, onnx_cache_dir)
     return mfd_model
 
 
-def mfr_model_init(weight_dir, cfg_path, device='cpu'):
-    mfr_model = UnimernetModel(weight_dir, cfg_path, device)
+def mfr_model_init(weight_dir, cfg_path, device='cpu', quantize=False):
+    mfr_model = UnimernetModel(weight_dir, cfg_path, device, quantize)
     return mfr_model
 
 
@@ -52,8 +56,8 @@ def layout_model_init(weight, config_file, device):
     return model
 
 
-def doclayout_yolo_model_init(weight, device='cpu'):
-    model = DocLayoutYOLOModel(weight, device)
+def doclayout_yolo_model_init(weight, device='cpu', backend='torch', onnx_cache_dir=None):
+    model = DocLayoutYOLOModel(weight, device, backend, onnx_cache_dir)
     return model
 
 
@@ -62,7 +66,18 @@ def ocr_model_init(show_log: bool = False,
                    lang=None,
                    use_dilation=True,
                    det_db_unclip_ratio=1.8,
+                   cpu_threads=0,
+                   rec_batch_num=0,
+                   det_limit_side_len=0,
                    ):
+    extra_kwargs = {}
+    if cpu_threads is not None and cpu_threads > 0:
+        # Budget de threads des prédicteurs paddle, fixé à la création
+        extra_kwargs['cpu_threads'] = cpu_threads
+    if rec_batch_num is not None and rec_batch_num > 0:
+        extra_kwargs['rec_batch_num'] = rec_batch_num
+    if det_limit_side_len is not None and det_limit_side_len > 0:
+        extra_kwargs['det_limit_side_len'] = det_limit_side_len
     if lang is not None and lang != '':
         model = ModifiedPaddleOCR(
             show_log=show_log,
@@ -70,6 +85,7 @@ def ocr_model_init(show_log: bool = False,
             lang=lang,
             use_dilation=use_dilation,
             det_db_unclip_ratio=det_db_unclip_ratio,
+            **extra_kwargs,
         )
     else:
         model = ModifiedPaddleOCR(
@@ -78,10 +94,81 @@ def ocr_model_init(show_log: bool = False,
             use_dilation=use_dilation,
             det_db_unclip_ratio=det_db_unclip_ratio,
             # use_angle_cls=True,
+            **extra_kwargs,
         )
     return model
 
 
+class LazyAtomModel:
+    def __init__(self, atom_model_name: str, **kwargs):
+        """Modèle atomique chargé au premier accès à l'un de ses attributs.
+
+        Args:
+            atom_model_name (str): le nom du modèle atomique
+            **kwargs: les arguments transmis à atom_model_init
+        """
+        self._atom_model_name = atom_model_name
+        self._kwargs = kwargs
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        # Le verrou fait attendre un appelant pendant que le préchauffage charge le même modèle
+        with self._lock:
+            if self._model is None:
+                load_start = time.time()
+                self._model = atom_model_init(model_name=self._atom_model_name, **self._kwargs)
+                logger.info(f'modèle {self._atom_model_name} chargé à la demande, '
+                            f'temps: {round(time.time() - load_start, 2)}')
+        return self._model
+
+    def warm_up(self):
+        """Charge le modèle puis, pour la mise en page et la détection de formules, exécute une inférence sur une
+        image vide afin que les allocations du premier appel soient déjà faites."""
+        model = self.load()
+        if self._atom_model_name in [AtomicModel.Layout, AtomicModel.MFD]:
+            model.batch_predict([np.full((640, 640, 3), 255, dtype=np.uint8)], 1)
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+        return getattr(self.load(), item)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+
+def warm_up_atom_models(atom_models: list) -> threading.Thread:
+    """Préchauffe les modèles paresseux l'un après l'autre dans un thread d'arrière-plan.
+
+    Le préchauffage exécute une inférence sur les modèles de mise en page et de formules : le thread doit être
+    attendu avant d'utiliser ces modèles depuis un autre thread.
+
+    Args:
+        atom_models (list): les modèles à préchauffer, les modèles déjà chargés étant ignorés
+
+    Returns:
+        threading.Thread: le thread de préchauffage, déjà démarré
+    """
+    def run():
+        for atom_model in atom_models:
+            if not isinstance(atom_model, LazyAtomModel) or atom_model.loaded:
+                continue
+            try:
+                atom_model.warm_up()
+            except Exception as e:
+                # Le modèle sera de nouveau chargé au premier usage, qui remontera l'erreur
+                logger.warning(f'échec du préchauffage du modèle: {e}')
+
+    thread = threading.Thread(target=run, name='model-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
 class AtomModelSingleton:
     _instance = None
     _models = {}
@@ -91,12 +178,17 @@ class AtomModelSingleton:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def get_atom_model(self, atom_model_name: str, **kwargs):
+    def get_atom_model(self, atom_model_name: str, lazy: bool = False, **kwargs):
         lang = kwargs.get('lang', None)
         layout_model_name = kwargs.get('layout_model_name', None)
-        key = (atom_model_name, layout_model_name, lang)
+        # Les réglages des prédicteurs paddle sont fixés à la création, une autre valeur demande une autre instance
+        key = (atom_model_name, layout_model_name, lang, kwargs.get('ocr_cpu_threads', 0),
+               kwargs.get('ocr_rec_batch_num', 0), kwargs.get('ocr_det_limit_side_len', 0))
         if key not in self._models:
-            self._models[key] = atom_model_init(model_name=atom_model_name, **kwargs)
+            if lazy:
+                self._models[key] = LazyAtomModel(atom_model_name, **kwargs)
+            else:
+                self._models[key] = atom_model_init(model_name=atom_model_name, **kwargs)
         return self._models[key]
 
 
@@ -112,24 +204,32 @@ def atom_model_init(model_name: str, **kwargs):
         elif kwargs.get('layout_model_name') == MODEL_NAME.DocLayout_YOLO:
             atom_model = doclayout_yolo_model_init(
                 kwargs.get('doclayout_yolo_weights'),
-                kwargs.get('device')
+                kwargs.get('device'),
+                backend=kwargs.get('backend', 'torch'),
+                onnx_cache_dir=kwargs.get('onnx_cache_dir'),
             )
     elif model_name == AtomicModel.MFD:
         atom_model = mfd_model_init(
             kwargs.get('mfd_weights'),
-            kwargs.get('device')
+            kwargs.get('device'),
+            backend=kwargs.get('backend', 'torch'),
+            onnx_cache_dir=kwargs.get('onnx_cache_dir'),
         )
     elif model_name == AtomicModel.MFR:
         atom_model = mfr_model_init(
             kwargs.get('mfr_weight_dir'),
             kwargs.get('mfr_cfg_path'),
-            kwargs.get('device')
+            kwargs.get('device'),
+            quantize=kwargs.get('mfr_quantize', False),
         )
     elif model_name == AtomicModel.OCR:
         atom_model = ocr_model_init(
             kwargs.get('ocr_show_log'),
             kwargs.get('det_db_box_thresh'),
-            kwargs.get('lang')
+            kwargs.get('lang'),
+            cpu_threads=kwargs.get('ocr_cpu_threads', 0),
+            rec_batch_num=kwargs.get('ocr_rec_batch_num', 0),
+            det_limit_side_len=kwargs.get('ocr_det_limit_side_len', 0),
         )
     elif model_name == AtomicModel.Table:
         atom_model = table_model_init(
@@ -1,24 +1,49 @@
+import os
+import shutil
+import tempfile
 import time
 
+import cv2
+import numpy as np
 import torch
-from PIL import Image
 from loguru import logger
 
 from panda_vision.libs.clean_memory import clean_memory
+from panda_vision.libs.hash_utils import compute_md5
 
 
-def crop_img(input_res, input_pil_img, crop_paste_x=0, crop_paste_y=0):
+def crop_img(input_res, input_img, crop_paste_x=0, crop_paste_y=0):
+    """Crop the region of input_res out of a numpy page image (RGB or BGR, the channel order is kept).
+
+    Without paste margin and inside the page, the result is a view of the page array and nothing is copied.
+    Otherwise the crop is padded once with cv2.copyMakeBorder: black outside the page, as PIL crop did, then the
+    white paste margin.
+    """
     crop_xmin, crop_ymin = int(input_res['poly'][0]), int(input_res['poly'][1])
     crop_xmax, crop_ymax = int(input_res['poly'][4]), int(input_res['poly'][5])
-    # Create a white background with an additional width and height of 50
     crop_new_width = crop_xmax - crop_xmin + crop_paste_x * 2
     crop_new_height = crop_ymax - crop_ymin + crop_paste_y * 2
-    return_image = Image.new('RGB', (crop_new_width, crop_new_height), 'white')
 
-    # Crop image
-    crop_box = (crop_xmin, crop_ymin, crop_xmax, crop_ymax)
-    cropped_img = input_pil_img.crop(crop_box)
-    return_image.paste(cropped_img, (crop_paste_x, crop_paste_y))
+    img_height, img_width = input_img.shape[:2]
+    inner_xmin, inner_ymin = max(crop_xmin, 0), max(crop_ymin, 0)
+    inner_xmax, inner_ymax = min(crop_xmax, img_width), min(crop_ymax, img_height)
+    if inner_xmax <= inner_xmin or inner_ymax <= inner_ymin:
+        return_image = np.zeros((max(crop_ymax - crop_ymin, 0), max(crop_xmax - crop_xmin, 0), input_img.shape[2]),
+                                dtype=input_img.dtype)
+    else:
+        return_image = input_img[inner_ymin:inner_ymax, inner_xmin:inner_xmax]
+        if (inner_xmin, inner_ymin, inner_xmax, inner_ymax) != (crop_xmin, crop_ymin, crop_xmax, crop_ymax):
+            return_image = cv2.copyMakeBorder(
+                return_image, inner_ymin - crop_ymin, crop_ymax - inner_ymax, inner_xmin - crop_xmin,
+                crop_xmax - inner_xmax, cv2.BORDER_CONSTANT, value=(0, 0, 0)
+            )
+
+    # Add a white border of crop_paste_x / crop_paste_y around the crop
+    if crop_paste_x > 0 or crop_paste_y > 0:
+        return_image = cv2.copyMakeBorder(
+            return_image, crop_paste_y, crop_paste_y, crop_paste_x, crop_paste_x,
+            cv2.BORDER_CONSTANT, value=(255, 255, 255)
+        )
     return_list = [crop_paste_x, crop_paste_y, crop_xmin, crop_ymin, crop_xmax, crop_ymax, crop_new_width, crop_new_height]
     return return_image, return_list
 
@@ -48,4 +73,30 @@ def clean_vram(device, vram_threshold=8):
             gc_start = time.time()
             clean_memory()
             gc_time = round(time.time() - gc_start, 2)
-            logger.info(f"gc time: {gc_time}")
\ No newline at end of file
+            logger.info(f"gc time: {gc_time}")
+
+
+def export_onnx_cached(weight, model_cls, imgsz, cache_dir):
+    """Exporte une seule fois un détecteur de type ultralytics en ONNX et renvoie le chemin du graphe en cache.
+
+    Le graphe est identifié par le md5 du fichier de poids et la taille d'entrée, un changement de poids déclenche
+    donc un nouvel export. L'export se fait sur une copie des poids dans un répertoire temporaire et le résultat est
+    déplacé de façon atomique dans cache_dir, les processus concurrents ne voyant jamais un fichier partiel.
+    """
+    with open(weight, 'rb') as f:
+        weight_md5 = compute_md5(f.read())
+    weight_stem = os.path.splitext(os.path.basename(weight))[0]
+    onnx_path = os.path.join(cache_dir, f'{weight_stem}_{imgsz}_{weight_md5[:12]}.onnx')
+    if os.path.exists(onnx_path):
+        return onnx_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    export_start = time.time()
+    with tempfile.TemporaryDirectory(dir=cache_dir) as export_dir:
+        export_weight = shutil.copy(weight, export_dir)
+        # Axes dynamiques pour les prédictions par lots et les entrées letterbox non carrées
+        exported_path = model_cls(export_weight).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+        os.replace(exported_path, onnx_path)
+    logger.info(f"export onnx de {weight_stem} mis en cache dans {onnx_path}, "
+                f"temps d'export: {round(time.time() - export_start, 2)}")
+    return onnx_path
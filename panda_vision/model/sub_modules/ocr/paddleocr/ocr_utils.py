@@ -229,6 +229,50 @@ def merge_det_boxes(dt_boxes):
     return new_dt_boxes
 
 
+def assign_det_boxes_to_regions(dt_boxes, region_bboxes, overlap_ratio=0.5):
+    """
+    Distribute text boxes detected on the whole page among the layout regions.
+
+    Each box goes to the region covering the largest part of it, provided that part is at least overlap_ratio of
+    the box area, and is clipped to that region as the region crop would have done. Boxes outside every region
+    are dropped, like text outside the OCR regions was never seen before.
+
+    :param dt_boxes: boxes detected on the page, each one four corner points
+    :param region_bboxes: region bboxes [x0, y0, x1, y1] in page coordinates
+    :param overlap_ratio: minimum part of the box area that has to fall in the region
+    :return: one list of boxes per region
+    """
+    region_boxes_list = [[] for _ in region_bboxes]
+    for text_box in dt_boxes:
+        xs = [point[0] for point in text_box]
+        ys = [point[1] for point in text_box]
+        box_x0, box_y0, box_x1, box_y1 = min(xs), min(ys), max(xs), max(ys)
+        box_area = (box_x1 - box_x0) * (box_y1 - box_y0)
+        if box_area <= 0:
+            continue
+
+        best_index, best_ratio = -1, 0
+        for index, (x0, y0, x1, y1) in enumerate(region_bboxes):
+            inter_w = min(box_x1, x1) - max(box_x0, x0)
+            inter_h = min(box_y1, y1) - max(box_y0, y0)
+            if inter_w <= 0 or inter_h <= 0:
+                continue
+            ratio = inter_w * inter_h / box_area
+            if ratio > best_ratio:
+                best_index, best_ratio = index, ratio
+        if best_index < 0 or best_ratio < overlap_ratio:
+            continue
+
+        if calculate_is_angle(text_box):
+            region_boxes_list[best_index].append(np.array(text_box, dtype=np.float32))
+        else:
+            x0, y0, x1, y1 = region_bboxes[best_index]
+            region_boxes_list[best_index].append(bbox_to_points(
+                [max(box_x0, x0), max(box_y0, y0), min(box_x1, x1), min(box_y1, y1)]
+            ))
+    return region_boxes_list
+
+
 def get_adjusted_mfdetrec_res(single_page_mfdetrec_res, useful_list):
     paste_x, paste_y, xmin, ymin, xmax, ymax, new_width, new_height = useful_list
     # Adjust the coordinates of the formula area
@@ -112,6 +112,60 @@ class ModifiedPaddleOCR(PaddleOCR):
                 return cls_res
             return ocr_res
 
+    def det_page(self, img):
+        """
+        Run text detection once on a whole page, without merging or splitting the boxes.
+        args：
+            img: the BGR page image
+        """
+        img = check_img(img)
+        dt_boxes, elapse = self.text_detector(img)
+        if dt_boxes is None:
+            return []
+        logger.debug("page dt_boxes num : {}, elapsed : {}".format(len(dt_boxes), elapse))
+        return sorted_boxes(dt_boxes)
+
+    def split_region_boxes(self, dt_boxes, mfd_res=None):
+        """
+        Merge the boxes of one region into lines and split them around formulas, as ocr() does for a region crop.
+        """
+        if len(dt_boxes) == 0:
+            return []
+        dt_boxes = merge_det_boxes(dt_boxes)
+        if mfd_res:
+            dt_boxes = update_det_boxes(dt_boxes, mfd_res)
+        return dt_boxes
+
+    def crop_text_lines(self, img, dt_boxes):
+        """
+        Crop the detected text lines out of img, the same way __call__ does before recognition.
+        args：
+            img: the BGR image the boxes were detected on
+            dt_boxes: boxes returned by ocr(img, rec=False)
+        """
+        img_crop_list = []
+        for box in dt_boxes:
+            tmp_box = np.array(box, dtype=np.float32)
+            if self.args.det_box_type == "quad":
+                img_crop = get_rotate_crop_image(img, tmp_box)
+            else:
+                img_crop = get_minarea_rect_crop(img, tmp_box)
+            img_crop_list.append(img_crop)
+        return img_crop_list
+
+    def rec_text_lines(self, img_crop_list, cls=True):
+        """
+        Recognize text line crops coming from any number of images in a single call.
+        The recognizer sorts the crops by width ratio and runs them in batches of rec_batch_num.
+        """
+        if len(img_crop_list) == 0:
+            return []
+        if self.use_angle_cls and cls:
+            img_crop_list, angle_list, elapse = self.text_classifier(img_crop_list)
+        rec_res, elapse = self.text_recognizer(img_crop_list)
+        logger.debug("rec_res num  : {}, elapsed : {}".format(len(rec_res), elapse))
+        return rec_res
+
     def __call__(self, img, cls=True, mfd_res=None):
         time_dict = {'det': 0, 'rec': 0, 'cls': 0, 'all': 0}
 
@@ -0,0 +1,88 @@
+import json
+import os
+import time
+
+import torch
+from loguru import logger
+
+from panda_vision.libs.hash_utils import compute_sha256
+
+# Répertoire par défaut des state dicts quantifiés
+QUANTIZED_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'panda_vision', 'quantized')
+
+
+def _weights_fingerprint(weights_path: str) -> str:
+    """Empreinte des poids d'origine calculée sur les chemins, tailles et dates des fichiers, sans les relire.
+    Un identifiant qui n'est pas un chemin local (modèle du hub) est pris tel quel."""
+    if not os.path.exists(weights_path):
+        return compute_sha256(weights_path)[:16]
+    if os.path.isdir(weights_path):
+        file_paths = sorted(
+            os.path.join(root, file_name) for root, _, file_names in os.walk(weights_path) for file_name in file_names
+        )
+    else:
+        file_paths = [weights_path]
+    stats = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        stats.append(f'{file_path}|{stat.st_size}|{stat.st_mtime_ns}')
+    return compute_sha256('\n'.join(stats))[:16]
+
+
+def quantize_linear_dynamic(model, model_name: str, weights_path: str, accuracy_check=None,
+                            min_agreement: float = 0.9, cache_dir: str = QUANTIZED_CACHE_DIR):
+    """Quantifie dynamiquement en INT8 les couches linéaires d'un modèle pour l'inférence sur CPU.
+
+    Au premier chargement, le modèle quantifié est comparé au modèle fp32 par accuracy_check. Il n'est retenu que si
+    l'accord atteint min_agreement, et la décision est mise en cache avec le state dict quantifié. Les chargements
+    suivants reprennent ce state dict sans refaire la vérification.
+
+    Args:
+        model (torch.nn.Module): le modèle fp32, sur CPU et en mode eval
+        model_name (str): le nom du modèle dans le cache
+        weights_path (str): le fichier ou le répertoire des poids d'origine, dont dépend l'entrée du cache
+        accuracy_check (Callable, optional): fonction (modèle fp32, modèle quantifié) -> accord entre 0 et 1.
+            Par défaut None, le modèle quantifié est alors retenu sans vérification.
+        min_agreement (float, optional): l'accord minimum pour retenir le modèle quantifié. Par défaut 0.9.
+        cache_dir (str, optional): le répertoire du cache. Par défaut ~/.cache/panda_vision/quantized.
+
+    Returns:
+        torch.nn.Module: le modèle quantifié, ou le modèle fp32 si la vérification a échoué
+    """
+    cache_key = f'{model_name}_{_weights_fingerprint(weights_path)}'
+    state_dict_path = os.path.join(cache_dir, f'{cache_key}.pt')
+    meta_path = os.path.join(cache_dir, f'{cache_key}.json')
+
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    # Une décision prise avec un autre seuil est reprise
+    if meta is not None and meta['min_agreement'] == min_agreement:
+        if not meta['accepted']:
+            logger.warning(f'quantification int8 de {model_name} écartée (accord {meta["agreement"]}), modèle fp32')
+            return model
+        if os.path.exists(state_dict_path):
+            quantized_model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+            quantized_model.load_state_dict(torch.load(state_dict_path, map_location='cpu'))
+            logger.info(f'{model_name} quantifié en int8 depuis le cache {state_dict_path}')
+            return quantized_model.eval()
+
+    quantize_start = time.time()
+    quantized_model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8).eval()
+    agreement = 1.0
+    if accuracy_check is not None:
+        with torch.no_grad():
+            agreement = round(float(accuracy_check(model, quantized_model)), 4)
+    accepted = agreement >= min_agreement
+    logger.info(f'quantification int8 de {model_name}: accord avec fp32 {agreement}, '
+                f'{"retenue" if accepted else "écartée"}, temps: {round(time.time() - quantize_start, 2)}')
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if accepted:
+        torch.save(quantized_model.state_dict(), state_dict_path)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'accepted': accepted, 'agreement': agreement, 'min_agreement': min_agreement}, f)
+    return quantized_model if accepted else model
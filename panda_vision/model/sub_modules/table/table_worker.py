@@ -0,0 +1,162 @@
+import multiprocessing
+import time
+
+import cv2
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+from panda_vision.config.constants import MODEL_NAME
+
+
+def table_model_predict(table_model, table_model_name, image):
+    """Reconnaît un tableau et renvoie son html.
+
+    Args:
+        table_model: le modèle de tableau
+        table_model_name (str): le nom du modèle de tableau
+        image (np.ndarray): la découpe du tableau, tableau numpy RGB
+
+    Returns:
+        str: le code html du tableau, None si le modèle ne renvoie rien
+    """
+    html_code = None
+    if table_model_name == MODEL_NAME.STRUCT_EQTABLE:
+        # import local, le pilotage du processus de tableau n'a pas besoin de torch
+        import torch
+
+        with torch.no_grad():
+            table_result = table_model.predict(Image.fromarray(image), 'html')
+            if len(table_result) > 0:
+                html_code = table_result[0]
+    elif table_model_name == MODEL_NAME.TABLE_MASTER:
+        # TableMaster attend une image BGR quand elle reçoit un tableau numpy
+        html_code = table_model.img2html(cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+    elif table_model_name == MODEL_NAME.RAPID_TABLE:
+        html_code, table_cell_bboxes, elapse = table_model.predict(np.ascontiguousarray(image))
+    return html_code
+
+
+def _table_worker_main(conn, table_model_name, table_model_path, table_max_time, device):
+    from panda_vision.model.sub_modules.model_init import table_model_init
+
+    table_model = table_model_init(table_model_name, table_model_path, table_max_time, device)
+    conn.send(('ready', None))
+    while True:
+        image = conn.recv()
+        if image is None:
+            break
+        try:
+            conn.send(('ok', table_model_predict(table_model, table_model_name, image)))
+        except Exception as e:
+            conn.send(('error', repr(e)))
+    conn.close()
+
+
+class TableWorker:
+    # Point d'entrée du processus, fonction de module pour être transmise au processus démarré par spawn
+    worker_main = staticmethod(_table_worker_main)
+
+    def __init__(self, table_model_name, table_model_path, table_max_time, device='cpu'):
+        """Modèle de tableau isolé dans un processus dédié, afin de pouvoir interrompre un tableau qui dépasse son
+        budget de temps.
+
+        Le processus est démarré au premier tableau. Lorsqu'un tableau dépasse table_max_time, le processus est tué
+        et sera redémarré au tableau suivant, le chargement du modèle n'étant pas compté dans le budget. close, ou
+        la sortie d'un bloc with, arrête le processus.
+
+        Args:
+            table_model_name (str): le nom du modèle de tableau
+            table_model_path (str): le chemin des poids du modèle
+            table_max_time (float): le temps maximum accordé à un tableau, en secondes
+            device (str, optional): le périphérique du modèle. Par défaut 'cpu'.
+        """
+        self.table_model_name = table_model_name
+        self.table_model_path = table_model_path
+        self.table_max_time = table_max_time
+        self.device = device
+        # spawn plutôt que fork, le processus parent a déjà initialisé torch, paddle et éventuellement cuda
+        self._ctx = multiprocessing.get_context('spawn')
+        self._process = None
+        self._conn = None
+
+    def __start(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._process = self._ctx.Process(
+            target=self.worker_main,
+            args=(child_conn, self.table_model_name, self.table_model_path, self.table_max_time, self.device),
+            name='table-worker',
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        load_start = time.time()
+        try:
+            self._conn.recv()
+        except EOFError:
+            self.__kill()
+            raise RuntimeError('le processus de reconnaissance de tableau s\'est arrêté pendant le chargement')
+        logger.info(f'processus de tableau démarré, temps de chargement: {round(time.time() - load_start, 2)}')
+
+    def __kill(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._process = None
+
+    def predict(self, image):
+        """Reconnaît un tableau dans le processus dédié.
+
+        Args:
+            image (np.ndarray): la découpe du tableau, tableau numpy RGB
+
+        Returns:
+            str: le code html du tableau, None si le budget de temps est dépassé ou si la reconnaissance échoue
+        """
+        if self._process is None or not self._process.is_alive():
+            self.__kill()
+            self.__start()
+        answered = False
+        try:
+            self._conn.send(np.ascontiguousarray(image))
+            if not self._conn.poll(self.table_max_time):
+                logger.warning(
+                    f'le traitement de reconnaissance de tableau dépasse le temps maximum {self.table_max_time}s, '
+                    f'processus interrompu'
+                )
+                return None
+            try:
+                status, html_code = self._conn.recv()
+            except EOFError:
+                logger.warning('le processus de reconnaissance de tableau s\'est arrêté')
+                return None
+            answered = True
+        finally:
+            # Sans réponse lue, le processus est tué : une réponse tardive ne doit pas être prise pour celle du
+            # tableau suivant
+            if not answered:
+                self.__kill()
+        if status != 'ok':
+            logger.warning(f'échec du traitement de reconnaissance de tableau: {html_code}')
+            return None
+        return html_code
+
+    def close(self):
+        """Arrête le processus de tableau, il sera redémarré au tableau suivant."""
+        if self._process is not None and self._process.is_alive():
+            try:
+                self._conn.send(None)
+                self._process.join(timeout=5)
+            except (BrokenPipeError, OSError):
+                pass
+        self.__kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -13,7 +13,8 @@ from panda_vision.config.ocr_content_type import BlockType, ContentType
 from panda_vision.data.dataset import Dataset, PageableData
 from panda_vision.libs.boxbase import calculate_overlap_area_in_bbox1_area_ratio
 from panda_vision.libs.clean_memory import clean_memory
-from panda_vision.libs.config_reader import get_local_layoutreader_model_dir
+from panda_vision.config.constants import LAYOUTREADER_BATCH_SIZE_VALUE
+from panda_vision.libs.config_reader import get_layoutreader_config, get_local_layoutreader_model_dir
 from panda_vision.libs.convert_utils import dict_to_list
 from panda_vision.libs.hash_utils import compute_md5
 
@@ -283,13 +284,22 @@ def model_init(model_name: str):
             logger.warning(
                 'le modèle layoutreader local n\'existe pas, utiliser le modèle en ligne depuis huggingface'
             )
+            layoutreader_model_dir = 'hantian/layoutreader'
             model = LayoutLMv3ForTokenClassification.from_pretrained(
-                'hantian/layoutreader'
+                layoutreader_model_dir
             )
         # Vérifier si l'appareil prend en charge bfloat16
         if supports_bfloat16:
             model.bfloat16()
         model.to(device).eval()
+        # Quantification int8 des couches linéaires, sur cpu uniquement
+        if device.type == 'cpu' and get_layoutreader_config().get('quantize', False):
+            from panda_vision.model.sub_modules.quantization import \
+                quantize_linear_dynamic
+            from panda_vision.model.sub_modules.reading_oreder.layoutreader.helpers import \
+                reading_order_agreement
+            model = quantize_linear_dynamic(model, 'layoutreader', layoutreader_model_dir,
+                                            accuracy_check=reading_order_agreement)
     else:
         logger.error('nom de modèle non autorisé')
         exit(1)
@@ -321,6 +331,17 @@ def do_predict(boxes: List[List[int]], model) -> List[int]:
     return parse_logits(logits, len(boxes))
 
 
+def do_batch_predict(boxes_list: List[List[List[int]]], model) -> List[List[int]]:
+    """Prédit l'ordre de lecture de plusieurs pages en une passe, les pages étant complétées à la même longueur."""
+    from panda_vision.model.sub_modules.reading_oreder.layoutreader.helpers import (
+        batch_boxes2inputs, parse_logits, prepare_inputs)
+
+    inputs = batch_boxes2inputs(boxes_list)
+    inputs = prepare_inputs(inputs, model)
+    logits = model(**inputs).logits.cpu()
+    return [parse_logits(page_logits, len(boxes)) for page_logits, boxes in zip(logits, boxes_list)]
+
+
 def cal_block_index(fix_blocks, sorted_bboxes):
 
     if sorted_bboxes is not None:
@@ -421,7 +442,13 @@ def insert_lines_into_block(block_bbox, line_height, page_w, page_h):
         return [[x0, y0, x1, y1]]
 
 
-def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
+def get_lines_for_model(fix_blocks, page_w, page_h, line_height):
+    """Prépare les lignes de la page pour layoutreader, en découpant en lignes virtuelles les blocs qui n'en ont pas.
+
+    Returns:
+        tuple: (les bbox des lignes, leurs boîtes à l'échelle 0-1000 de layoutreader ou None si la page a trop de
+            lignes)
+    """
     page_line_list = []
     for block in fix_blocks:
         if block['type'] in [
@@ -449,7 +476,7 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
             page_line_list.extend(lines)
 
     if len(page_line_list) > 200:  # layoutreader supporte au maximum 512 lignes
-        return None
+        return page_line_list, None
 
     # Utiliser layoutreader pour trier
     x_scale = 1000.0 / page_w
@@ -486,6 +513,14 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
             1000 >= right >= left >= 0 and 1000 >= bottom >= top >= 0
         ), f'Boîte invalide. right: {right}, left: {left}, bottom: {bottom}, top: {top}'  # noqa: E126, E121
         boxes.append([left, top, right, bottom])
+    return page_line_list, boxes
+
+
+def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
+    page_line_list, boxes = get_lines_for_model(fix_blocks, page_w, page_h, line_height)
+    if boxes is None:
+        return None
+
     model_manager = ModelSingleton()
     model = model_manager.get_model('layoutreader')
     with torch.no_grad():
@@ -495,6 +530,41 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
     return sorted_bboxes
 
 
+def batch_sort_lines_by_model(pages_lines: list, batch_size: int) -> list:
+    """Tri des lignes de plusieurs pages par layoutreader, les pages de longueurs proches étant regroupées par lots
+    de batch_size pour limiter le remplissage.
+
+    Args:
+        pages_lines (list): les (bbox des lignes, boîtes) de chaque page, renvoyés par get_lines_for_model
+        batch_size (int): le nombre de pages par passe du modèle
+
+    Returns:
+        list: les bbox triées de chaque page, None pour les pages qui ont trop de lignes
+    """
+    pages_sorted_bboxes = [None] * len(pages_lines)
+    page_indexes = [index for index, (_, boxes) in enumerate(pages_lines) if boxes is not None]
+    for index in page_indexes:
+        if len(pages_lines[index][1]) == 0:
+            pages_sorted_bboxes[index] = []
+    page_indexes = sorted((index for index in page_indexes if len(pages_lines[index][1]) > 0),
+                          key=lambda index: len(pages_lines[index][1]))
+    if len(page_indexes) == 0:
+        return pages_sorted_bboxes
+
+    model_manager = ModelSingleton()
+    model = model_manager.get_model('layoutreader')
+    batch_size = max(batch_size, 1)
+    for start in range(0, len(page_indexes), batch_size):
+        batch_indexes = page_indexes[start: start + batch_size]
+        with torch.no_grad():
+            batch_orders = do_batch_predict([pages_lines[index][1] for index in batch_indexes], model)
+        for index, orders in zip(batch_indexes, batch_orders):
+            page_line_list = pages_lines[index][0]
+            pages_sorted_bboxes[index] = [page_line_list[i] for i in orders]
+
+    return pages_sorted_bboxes
+
+
 def get_line_height(blocks):
     page_line_height_list = []
     for block in blocks:
@@ -611,9 +681,15 @@ def remove_outside_spans(spans, all_bboxes, all_discarded_blocks):
     return new_spans
 
 
-def parse_page_core(
+def parse_page_blocks(
     page_doc: PageableData, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
 ):
+    """Construit les blocs de la page jusqu'à la préparation des lignes pour layoutreader, le tri par ordre de
+    lecture étant fait ensuite par finish_page_blocks.
+
+    Returns:
+        dict: l'état de la page, dont page_info déjà construit si la page n'a pas de bbox valide
+    """
     need_drop = False
     drop_reason = []
 
@@ -698,7 +774,7 @@ def parse_page_core(
     """Si la page actuelle n'a pas de bbox valide, la sauter"""
     if len(all_bboxes) == 0:
         logger.warning(f'skip this page, not found useful bbox, page_id: {page_id}')
-        return ocr_construct_page_component_v2(
+        return {'page_info': ocr_construct_page_component_v2(
             [],
             [],
             page_id,
@@ -711,7 +787,7 @@ def parse_page_core(
             fix_discarded_blocks,
             need_drop,
             drop_reason,
-        )
+        )}
 
     """Capturer les images et tableaux"""
     spans = ocr_cut_image_and_table(
@@ -727,8 +803,26 @@ def parse_page_core(
     """Obtenir toutes les lignes et calculer la hauteur des lignes de texte"""
     line_height = get_line_height(fix_blocks)
 
-    """Obtenir toutes les lignes et les trier"""
-    sorted_bboxes = sort_lines_by_model(fix_blocks, page_w, page_h, line_height)
+    """Obtenir toutes les lignes à trier"""
+    page_lines = get_lines_for_model(fix_blocks, page_w, page_h, line_height)
+
+    return {
+        'page_id': page_id,
+        'page_w': page_w,
+        'page_h': page_h,
+        'fix_blocks': fix_blocks,
+        'fix_discarded_blocks': fix_discarded_blocks,
+        'page_lines': page_lines,
+        'need_drop': need_drop,
+        'drop_reason': drop_reason,
+    }
+
+
+def finish_page_blocks(page_state, sorted_bboxes):
+    """Ordonne les blocs de la page à partir des lignes triées et construit page_info."""
+    if 'page_info' in page_state:
+        return page_state['page_info']
+    fix_blocks = page_state['fix_blocks']
 
     """Calculer les relations de séquence des blocs selon la médiane des lignes"""
     fix_blocks = cal_block_index(fix_blocks, sorted_bboxes)
@@ -746,20 +840,30 @@ def parse_page_core(
     page_info = ocr_construct_page_component_v2(
         sorted_blocks,
         [],
-        page_id,
-        page_w,
-        page_h,
+        page_state['page_id'],
+        page_state['page_w'],
+        page_state['page_h'],
         [],
         images,
         tables,
         interline_equations,
-        fix_discarded_blocks,
-        need_drop,
-        drop_reason,
+        page_state['fix_discarded_blocks'],
+        page_state['need_drop'],
+        page_state['drop_reason'],
     )
     return page_info
 
 
+def parse_page_core(
+    page_doc: PageableData, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
+):
+    page_state = parse_page_blocks(page_doc, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang)
+    sorted_bboxes = None
+    if 'page_info' not in page_state:
+        sorted_bboxes = batch_sort_lines_by_model([page_state['page_lines']], 1)[0]
+    return finish_page_blocks(page_state, sorted_bboxes)
+
+
 def pdf_parse_union(
     dataset: Dataset,
     model_list,
@@ -793,6 +897,7 @@ def pdf_parse_union(
     """Initialiser le temps de démarrage"""
     start_time = time.time()
 
+    page_states = {}
     for page_id, page in enumerate(dataset):
         """Afficher le temps d'analyse de chaque page en mode debug"""
         if debug_mode:
@@ -804,7 +909,7 @@ def pdf_parse_union(
 
         """Analyser chaque page du pdf"""
         if start_page_id <= page_id <= end_page_id:
-            page_info = parse_page_core(
+            page_states[page_id] = parse_page_blocks(
                 page, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
             )
         else:
@@ -814,7 +919,22 @@ def pdf_parse_union(
             page_info = ocr_construct_page_component_v2(
                 [], [], page_id, page_w, page_h, [], [], [], [], [], True, 'skip page'
             )
-        pdf_info_dict[f'page_{page_id}'] = page_info
+            pdf_info_dict[f'page_{page_id}'] = page_info
+
+    """Trier les lignes de toutes les pages par lots avec layoutreader"""
+    sort_page_ids = [page_id for page_id, page_state in page_states.items() if 'page_info' not in page_state]
+    sort_start = time.time()
+    pages_sorted_bboxes = batch_sort_lines_by_model(
+        [page_states[page_id]['page_lines'] for page_id in sort_page_ids],
+        get_layoutreader_config().get('batch_size', LAYOUTREADER_BATCH_SIZE_VALUE),
+    )
+    if len(sort_page_ids) > 0:
+        logger.info(f'temps de tri layoutreader: {round(time.time() - sort_start, 2)}, pages: {len(sort_page_ids)}')
+    pages_sorted_bboxes = dict(zip(sort_page_ids, pages_sorted_bboxes))
+    for page_id, page_state in page_states.items():
+        pdf_info_dict[f'page_{page_id}'] = finish_page_blocks(page_state, pages_sorted_bboxes.get(page_id))
+    # Remettre les pages dans l'ordre du document
+    pdf_info_dict = {f'page_{page_id}': pdf_info_dict[f'page_{page_id}'] for page_id in range(len(dataset))}
 
     """Segmentation"""
     para_split(pdf_info_dict)
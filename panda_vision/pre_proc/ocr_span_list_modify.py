@@ -1,59 +1,83 @@
 
 from panda_vision.config.drop_tag import DropTag
 from panda_vision.config.ocr_content_type import BlockType
-from panda_vision.libs.boxbase import calculate_iou, get_minbox_if_overlap_by_ratio
+from panda_vision.libs.boxbase import (calculate_iou,
+                                    get_minbox_if_overlap_by_ratio,
+                                    get_touching_bbox_indices)
+
+
+def _equal_span_classes(spans):
+    """Indice du premier span égal (==) à chaque span. Les spans égaux sont traités comme un seul span, à la
+    manière des comparaisons par égalité sur des listes, et seuls les spans de même bbox sont comparés."""
+    span_classes = []
+    classes_by_bbox = {}
+    for i, span in enumerate(spans):
+        bbox_classes = classes_by_bbox.setdefault(tuple(span['bbox']), [])
+        span_class = next((k for k in bbox_classes if spans[k] == span), None)
+        if span_class is None:
+            span_class = i
+            bbox_classes.append(i)
+        span_classes.append(span_class)
+    return span_classes
+
+
+def _remove_dropped_spans(spans, dropped):
+    """Retire de spans le premier span égal à chaque span abandonné et marque les spans abandonnés."""
+    if len(dropped) > 0:
+        spans[:] = [span for i, span in enumerate(spans) if i not in dropped]
+        for span_need_remove in dropped.values():
+            span_need_remove['tag'] = DropTag.SPAN_OVERLAP
+    return spans, list(dropped.values())
 
 
 def remove_overlaps_low_confidence_spans(spans):
-    dropped_spans = []
+    span_classes = _equal_span_classes(spans)
+    touching = get_touching_bbox_indices([span['bbox'] for span in spans])
+    # Classe du span abandonné -> span abandonné, dans l'ordre d'abandon
+    dropped = {}
     #  Supprimer les spans qui se chevauchent avec une confiance plus faible
-    for span1 in spans:
-        for span2 in spans:
-            if span1 != span2:
-                # span1 ou span2 ne devraient pas être dans dropped_spans
-                if span1 in dropped_spans or span2 in dropped_spans:
-                    continue
+    for i, span1 in enumerate(spans):
+        # Seuls les spans qui se touchent peuvent avoir un IoU non nul
+        for j in touching[i]:
+            # span1 ou span2 ne devraient pas être dans dropped
+            if span_classes[i] in dropped:
+                break
+            if span_classes[j] == span_classes[i] or span_classes[j] in dropped:
+                continue
+            span2 = spans[j]
+            if calculate_iou(span1['bbox'], span2['bbox']) > 0.9:
+                if span1['score'] < span2['score']:
+                    need_remove_idx = i
                 else:
-                    if calculate_iou(span1['bbox'], span2['bbox']) > 0.9:
-                        if span1['score'] < span2['score']:
-                            span_need_remove = span1
-                        else:
-                            span_need_remove = span2
-                        if (
-                            span_need_remove is not None
-                            and span_need_remove not in dropped_spans
-                        ):
-                            dropped_spans.append(span_need_remove)
+                    need_remove_idx = j
+                dropped[span_classes[need_remove_idx]] = spans[need_remove_idx]
 
-    if len(dropped_spans) > 0:
-        for span_need_remove in dropped_spans:
-            spans.remove(span_need_remove)
-            span_need_remove['tag'] = DropTag.SPAN_OVERLAP
-
-    return spans, dropped_spans
+    return _remove_dropped_spans(spans, dropped)
 
 
 def remove_overlaps_min_spans(spans):
-    dropped_spans = []
+    span_classes = _equal_span_classes(spans)
+    touching = get_touching_bbox_indices([span['bbox'] for span in spans])
+    # Premier span de chaque bbox, celui qui est retiré quand cette bbox est la plus petite d'un chevauchement
+    first_span_by_bbox = {}
+    for i, span in enumerate(spans):
+        first_span_by_bbox.setdefault(tuple(span['bbox']), i)
+    dropped = {}
     #  Supprimer les plus petits spans qui se chevauchent
-    for span1 in spans:
-        for span2 in spans:
-            if span1 != span2:
-                # span1 ou span2 ne devraient pas être dans dropped_spans
-                if span1 in dropped_spans or span2 in dropped_spans:
-                    continue
-                else:
-                    overlap_box = get_minbox_if_overlap_by_ratio(span1['bbox'], span2['bbox'], 0.65)
-                    if overlap_box is not None:
-                        span_need_remove = next((span for span in spans if span['bbox'] == overlap_box), None)
-                        if span_need_remove is not None and span_need_remove not in dropped_spans:
-                            dropped_spans.append(span_need_remove)
-    if len(dropped_spans) > 0:
-        for span_need_remove in dropped_spans:
-            spans.remove(span_need_remove)
-            span_need_remove['tag'] = DropTag.SPAN_OVERLAP
+    for i, span1 in enumerate(spans):
+        for j in touching[i]:
+            # span1 ou span2 ne devraient pas être dans dropped
+            if span_classes[i] in dropped:
+                break
+            if span_classes[j] == span_classes[i] or span_classes[j] in dropped:
+                continue
+            overlap_box = get_minbox_if_overlap_by_ratio(span1['bbox'], spans[j]['bbox'], 0.65)
+            if overlap_box is not None:
+                need_remove_idx = first_span_by_bbox[tuple(overlap_box)]
+                if span_classes[need_remove_idx] not in dropped:
+                    dropped[span_classes[need_remove_idx]] = spans[need_remove_idx]
 
-    return spans, dropped_spans
+    return _remove_dropped_spans(spans, dropped)
 
 
 def get_qa_need_list_v2(blocks):
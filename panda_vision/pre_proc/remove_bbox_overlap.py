@@ -1,5 +1,8 @@
+import numpy as np
+
 from panda_vision.config.drop_reason import DropReason
-from panda_vision.libs.boxbase import _is_in, _is_part_overlap
+from panda_vision.libs.boxbase import (_as_bbox_array, _is_in, _is_in_matrix,
+                                    _is_part_overlap)
 
 
 def _remove_overlap_between_bbox(bbox1, bbox2):
@@ -39,6 +42,52 @@ def _remove_overlap_between_bbox(bbox1, bbox2):
         return bbox1, bbox2, None
 
 
+def _remove_overlap_between_bbox_matrix(bboxes1, bboxes2):
+    """_remove_overlap_between_bbox sur tous les couples (bboxes1[i], bboxes2[j]).
+
+    Returns:
+        tuple: les tableaux N×M×4 des bbox1 et bbox2 retournées pour chaque couple, laissées telles quelles quand
+            le découpage donnerait une surface négative
+    """
+    b1 = _as_bbox_array(bboxes1)
+    b2 = _as_bbox_array(bboxes2)
+    ix0, iy0, ix1, iy1 = b1[:, None, 0], b1[:, None, 1], b1[:, None, 2], b1[:, None, 3]
+    x0, y0, x1, y1 = b2[None, :, 0], b2[None, :, 1], b2[None, :, 2], b2[None, :, 3]
+
+    # _is_part_overlap : les bbox se touchent sans que bbox1 soit incluse dans bbox2
+    part_overlap = ~((ix1 < x0) | (ix0 > x1) | (iy1 < y0) | (iy0 > y1)) & ~_is_in_matrix(b1, b2)
+
+    diff_x = np.minimum(x1, ix1) - np.maximum(x0, ix0)
+    diff_y = np.minimum(y1, iy1) - np.maximum(y0, iy0)
+    split_x = diff_y > diff_x
+    cut_ix1 = split_x & (x1 >= ix1)
+    cut_x1 = split_x & ~(x1 >= ix1)
+    cut_iy1 = ~split_x & (y1 >= iy1)
+    cut_y1 = ~split_x & ~(y1 >= iy1)
+
+    mid = np.where(cut_ix1, (x0 + ix1) // 2, 0)
+    mid = np.where(cut_x1, (ix0 + x1) // 2, mid)
+    mid = np.where(cut_iy1, (y0 + iy1) // 2, mid)
+    mid = np.where(cut_y1, (iy0 + y1) // 2, mid)
+    bboxes1_cut = np.stack(np.broadcast_arrays(
+        np.where(cut_x1, np.maximum(mid + 0.25, ix0), ix0),
+        np.where(cut_y1, np.maximum(mid + 0.25, iy0), iy0),
+        np.where(cut_ix1, np.minimum(mid - 0.25, ix1), ix1),
+        np.where(cut_iy1, np.minimum(iy1, mid - 0.25), iy1),
+    ), axis=-1)
+    bboxes2_cut = np.stack(np.broadcast_arrays(
+        np.where(cut_ix1, np.maximum(mid + 0.25, x0), x0),
+        np.where(cut_iy1, np.maximum(mid + 0.25, y0), y0),
+        np.where(cut_x1, np.minimum(mid - 0.25, x1), x1),
+        np.where(cut_y1, np.minimum(y1, mid - 0.25), y1),
+    ), axis=-1)
+
+    keep_cut = (part_overlap
+                & (bboxes1_cut[..., 2] > bboxes1_cut[..., 0]) & (bboxes1_cut[..., 3] > bboxes1_cut[..., 1])
+                & (bboxes2_cut[..., 3] > bboxes2_cut[..., 1]) & (bboxes2_cut[..., 2] > bboxes2_cut[..., 0]))[..., None]
+    return np.where(keep_cut, bboxes1_cut, b1[:, None, :]), np.where(keep_cut, bboxes2_cut, b2[None, :, :])
+
+
 def _remove_overlap_between_bboxes(arr):
     drop_reasons = []
     N = len(arr)
@@ -8,6 +8,7 @@ import panda_vision.model as model_config
 from panda_vision.data.data_reader_writer import FileBasedDataReader
 from panda_vision.libs.version import __version__
 from panda_vision.tools.common import do_parse, parse_pdf_methods
+from panda_vision.tools.worker_pool import parse_docs_with_workers
 
 
 @click.command()
@@ -79,7 +80,23 @@ without method specified, auto will be used by default.""",
     help='The ending page for PDF parsing, beginning from 0.',
     default=None,
 )
-def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
+@click.option(
+    '-w',
+    '--workers',
+    'workers',
+    type=int,
+    help='The number of worker processes used for a directory, each one holding its own model replica.',
+    default=1,
+)
+@click.option(
+    '-t',
+    '--threads-per-worker',
+    'threads_per_worker',
+    type=int,
+    help='The number of compute threads of each worker process, 0 to share the cpu cores between the workers.',
+    default=0,
+)
+def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id, workers, threads_per_worker):
     model_config.__use_inside_model__ = True
     model_config.__model_mode__ = 'full'
     os.makedirs(output_dir, exist_ok=True)
@@ -107,7 +124,20 @@ def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
         except Exception as e:
             logger.exception(e)
 
-    if os.path.isdir(path):
+    if os.path.isdir(path) and workers > 1:
+        parse_docs_with_workers(
+            sorted(str(doc_path) for doc_path in Path(path).glob('*.pdf')),
+            output_dir,
+            workers,
+            cpu_threads=threads_per_worker,
+            model_mode=model_config.__model_mode__,
+            parse_method=method,
+            debug_able=debug_able,
+            start_page_id=start_page_id,
+            end_page_id=end_page_id,
+            lang=lang,
+        )
+    elif os.path.isdir(path):
         for doc_path in Path(path).glob('*.pdf'):
             parse_doc(doc_path)
     else:
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from loguru import logger
+
+# Variables lues par les bibliothèques de calcul au chargement, à fixer avant l'import de torch et paddle
+_THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']
+
+
+def _init_parse_worker(cpu_threads: int, model_mode: str):
+    for env_var in _THREAD_ENV_VARS:
+        os.environ[env_var] = str(cpu_threads)
+
+    import torch
+
+    import panda_vision.model as model_config
+    torch.set_num_threads(cpu_threads)
+    model_config.__use_inside_model__ = True
+    model_config.__model_mode__ = model_mode
+    model_config.__cpu_threads__ = cpu_threads
+
+
+def _parse_doc_in_worker(doc_path: str, output_dir: str, parse_kwargs: dict) -> tuple:
+    """Analyse un document dans un processus du pool, le modèle étant chargé au premier document puis gardé par
+    ModelSingleton pour les suivants.
+
+    Returns:
+        tuple: (chemin du document, erreur ou None, durée en secondes)
+    """
+    from pathlib import Path
+
+    from panda_vision.data.data_reader_writer import FileBasedDataReader
+    from panda_vision.tools.common import do_parse
+
+    start = time.time()
+    try:
+        disk_rw = FileBasedDataReader(os.path.dirname(doc_path))
+        pdf_data = disk_rw.read(os.path.basename(doc_path))
+        do_parse(output_dir, str(Path(doc_path).stem), pdf_data, [], **parse_kwargs)
+    except Exception as e:
+        logger.exception(e)
+        return doc_path, f'{type(e).__name__}: {e}', time.time() - start
+    return doc_path, None, time.time() - start
+
+
+def parse_docs_with_workers(doc_paths: list, output_dir: str, workers: int, cpu_threads: int = 0,
+                            model_mode: str = 'full', **parse_kwargs) -> list:
+    """Analyse des documents avec un pool de processus, chacun gardant sa propre instance des modèles.
+
+    Les documents sont distribués par la file du pool au premier processus libre, chaque processus écrit ses
+    sorties lui-même et l'avancement comme les échecs remontent au processus principal.
+
+    Args:
+        doc_paths (list): les chemins des pdf
+        output_dir (str): le répertoire de sortie
+        workers (int): le nombre de processus
+        cpu_threads (int, optional): le nombre de threads de calcul de chaque processus, 0 pour répartir les cœurs
+            entre les processus. Par défaut 0.
+        model_mode (str, optional): le mode des modèles. Par défaut 'full'.
+        **parse_kwargs: les arguments transmis à do_parse
+
+    Returns:
+        list: les (chemin du document, erreur) des documents en échec
+    """
+    if cpu_threads <= 0:
+        cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+    logger.info(f'analyse de {len(doc_paths)} documents, processus: {workers}, threads par processus: {cpu_threads}')
+
+    failures = []
+    pool_start = time.time()
+    # spawn, chaque processus charge torch et paddle avec son propre budget de threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_parse_worker, initargs=(cpu_threads, model_mode)) as executor:
+        futures = [
+            executor.submit(_parse_doc_in_worker, str(doc_path), output_dir, parse_kwargs) for doc_path in doc_paths
+        ]
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            try:
+                doc_path, error, cost = future.result()
+            except Exception as e:
+                # Processus arrêté brutalement, le pool est inutilisable et les documents restants échouent aussi
+                doc_path, error, cost = doc_paths[futures.index(future)], f'{type(e).__name__}: {e}', 0
+            if error is None:
+                logger.info(f'[{done_count}/{len(doc_paths)}] {doc_path} terminé en {round(cost, 2)}s')
+            else:
+                failures.append((str(doc_path), error))
+                logger.error(f'[{done_count}/{len(doc_paths)}] {doc_path} en échec: {error}')
+
+    logger.info(f'{len(doc_paths) - len(failures)}/{len(doc_paths)} documents analysés en '
+                f'{round(time.time() - pool_start, 2)}s')
+    for doc_path, error in failures:
+        logger.error(f'échec: {doc_path}: {error}')
+    return failures
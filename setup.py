@@ -44,6 +44,13 @@ FULL_REQUIREMENTS = [
     "detectron2 @ git+https://github.com/facebookresearch/detectron2.git"
 ]
 
+# Export et exécution de DocLayout-YOLO et YOLOv8 MFD par onnxruntime ("backend": "onnx")
+ONNX_REQUIREMENTS = [
+    "onnx",
+    "onnxslim",
+    "onnxruntime",
+]
+
 OLD_LINUX_REQUIREMENTS = [
     "albumentations<=1.4.20"
 ]
@@ -64,6 +71,7 @@ if __name__ == '__main__':
         extras_require={
             "lite": LITE_REQUIREMENTS,
             "full": FULL_REQUIREMENTS,
+            "onnx": ONNX_REQUIREMENTS,
             "old_linux": OLD_LINUX_REQUIREMENTS
         },
         description="Un outil pratique pour convertir des PDF en Markdown",
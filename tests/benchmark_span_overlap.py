@@ -0,0 +1,68 @@
+"""Benchmark de la suppression des spans qui se chevauchent sur une page synthétique de 5000 spans.
+
+    python -m tests.benchmark_span_overlap [--reference]
+
+Avec --reference, les implémentations par comparaison de tous les couples sont aussi mesurées et leurs résultats
+comparés, ce qui prend plusieurs minutes.
+"""
+import argparse
+import copy
+import random
+import time
+
+from panda_vision.pre_proc.ocr_span_list_modify import (
+    remove_overlaps_low_confidence_spans, remove_overlaps_min_spans)
+from tests.test_ocr_span_list_modify import (
+    remove_overlaps_low_confidence_spans_reference,
+    remove_overlaps_min_spans_reference)
+
+
+def synthetic_page_spans(seed: int = 1) -> list:
+    """Page de 600×800 : 4750 mots sur 125 lignes, plus 250 doublons décalés d'un pixel comme ceux de l'OCR et des
+    formules en ligne."""
+    rng = random.Random(seed)
+    spans = []
+    for line in range(125):
+        y0 = 20 + line * 6
+        x = 20
+        for _ in range(38):
+            width = rng.randint(8, 14)
+            spans.append({'bbox': [x, y0, x + width, y0 + 5], 'score': round(rng.uniform(0.5, 1), 3),
+                          'type': 'text', 'content': 'w'})
+            x += width + 1
+    for _ in range(250):
+        x0, y0, x1, y1 = rng.choice(spans)['bbox']
+        spans.append({'bbox': [x0 + rng.randint(0, 1), y0, x1, y1 + rng.randint(-1, 0)],
+                      'score': round(rng.uniform(0.5, 1), 3), 'type': 'inline_equation', 'content': 'x'})
+    return spans
+
+
+def _timed(remove_overlaps, spans):
+    spans = copy.deepcopy(spans)
+    start = time.time()
+    kept, dropped = remove_overlaps(spans)
+    return time.time() - start, kept, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--reference', action='store_true', help='mesurer aussi les implémentations de référence')
+    args = parser.parse_args()
+
+    spans = synthetic_page_spans()
+    print(f'{len(spans)} spans')
+    for remove_overlaps, remove_overlaps_reference in [
+        (remove_overlaps_low_confidence_spans, remove_overlaps_low_confidence_spans_reference),
+        (remove_overlaps_min_spans, remove_overlaps_min_spans_reference),
+    ]:
+        cost, kept, dropped = _timed(remove_overlaps, spans)
+        line = f'{remove_overlaps.__name__}: {round(cost, 3)}s, {len(kept)} conservés, {len(dropped)} retirés'
+        if args.reference:
+            reference_cost, reference_kept, reference_dropped = _timed(remove_overlaps_reference, spans)
+            identical = kept == reference_kept and dropped == reference_dropped
+            line += f', référence: {round(reference_cost, 3)}s, résultats identiques: {identical}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+import copy
+import random
+
+import pytest
+
+from panda_vision.libs.boxbase import _is_in, bbox_distance, bbox_relative_pos
+from panda_vision.model.magic_model import MagicModel, PosRelationEnum
+from panda_vision.pre_proc.remove_bbox_overlap import _remove_overlap_between_bbox
+
+# Implémentation scalaire de __tie_up_category_by_distance_v2 avant sa vectorisation, figée comme référence
+
+
+def _reduct_overlap_scalar(bboxes):
+    N = len(bboxes)
+    keep = [True] * N
+    for i in range(N):
+        for j in range(N):
+            if i == j:
+                continue
+            if _is_in(bboxes[i]['bbox'], bboxes[j]['bbox']):
+                keep[i] = False
+    return [bboxes[i] for i in range(N) if keep[i]]
+
+
+def _tie_up_category_by_distance_v2_scalar(subject_dets, object_dets, priority_pos):
+    AXIS_MULPLICITY = 0.5
+    subjects = _reduct_overlap_scalar(
+        list(map(lambda x: {'bbox': x['bbox'], 'score': x['score']}, subject_dets))
+    )
+
+    objects = _reduct_overlap_scalar(
+        list(map(lambda x: {'bbox': x['bbox'], 'score': x['score']}, object_dets))
+    )
+    M = len(objects)
+
+    subjects.sort(key=lambda x: x['bbox'][0] ** 2 + x['bbox'][1] ** 2)
+    objects.sort(key=lambda x: x['bbox'][0] ** 2 + x['bbox'][1] ** 2)
+
+    sub_obj_map_h = {i: [] for i in range(len(subjects))}
+
+    dis_by_directions = {
+        'top': [[-1, float('inf')]] * M,
+        'bottom': [[-1, float('inf')]] * M,
+        'left': [[-1, float('inf')]] * M,
+        'right': [[-1, float('inf')]] * M,
+    }
+
+    for i, obj in enumerate(objects):
+        l_x_axis, l_y_axis = (
+            obj['bbox'][2] - obj['bbox'][0],
+            obj['bbox'][3] - obj['bbox'][1],
+        )
+        axis_unit = min(l_x_axis, l_y_axis)
+        for j, sub in enumerate(subjects):
+
+            bbox1, bbox2, _ = _remove_overlap_between_bbox(
+                objects[i]['bbox'], subjects[j]['bbox']
+            )
+            left, right, bottom, top = bbox_relative_pos(bbox1, bbox2)
+            flags = [left, right, bottom, top]
+            if sum([1 if v else 0 for v in flags]) > 1:
+                continue
+
+            if left:
+                if dis_by_directions['left'][i][1] > bbox_distance(
+                    obj['bbox'], sub['bbox']
+                ):
+                    dis_by_directions['left'][i] = [
+                        j,
+                        bbox_distance(obj['bbox'], sub['bbox']),
+                    ]
+            if right:
+                if dis_by_directions['right'][i][1] > bbox_distance(
+                    obj['bbox'], sub['bbox']
+                ):
+                    dis_by_directions['right'][i] = [
+                        j,
+                        bbox_distance(obj['bbox'], sub['bbox']),
+                    ]
+            if bottom:
+                if dis_by_directions['bottom'][i][1] > bbox_distance(
+                    obj['bbox'], sub['bbox']
+                ):
+                    dis_by_directions['bottom'][i] = [
+                        j,
+                        bbox_distance(obj['bbox'], sub['bbox']),
+                    ]
+            if top:
+                if dis_by_directions['top'][i][1] > bbox_distance(
+                    obj['bbox'], sub['bbox']
+                ):
+                    dis_by_directions['top'][i] = [
+                        j,
+                        bbox_distance(obj['bbox'], sub['bbox']),
+                    ]
+
+        if (
+            dis_by_directions['top'][i][1] != float('inf')
+            and dis_by_directions['bottom'][i][1] != float('inf')
+            and priority_pos in (PosRelationEnum.BOTTOM, PosRelationEnum.UP)
+        ):
+            RATIO = 3
+            if (
+                abs(
+                    dis_by_directions['top'][i][1]
+                    - dis_by_directions['bottom'][i][1]
+                )
+                < RATIO * axis_unit
+            ):
+
+                if priority_pos == PosRelationEnum.BOTTOM:
+                    sub_obj_map_h[dis_by_directions['bottom'][i][0]].append(i)
+                else:
+                    sub_obj_map_h[dis_by_directions['top'][i][0]].append(i)
+                continue
+
+        if dis_by_directions['left'][i][1] != float('inf') or dis_by_directions[
+            'right'
+        ][i][1] != float('inf'):
+            if dis_by_directions['left'][i][1] != float(
+                'inf'
+            ) and dis_by_directions['right'][i][1] != float('inf'):
+                if AXIS_MULPLICITY * axis_unit >= abs(
+                    dis_by_directions['left'][i][1]
+                    - dis_by_directions['right'][i][1]
+                ):
+                    left_sub_bbox = subjects[dis_by_directions['left'][i][0]][
+                        'bbox'
+                    ]
+                    right_sub_bbox = subjects[dis_by_directions['right'][i][0]][
+                        'bbox'
+                    ]
+
+                    left_sub_bbox_y_axis = left_sub_bbox[3] - left_sub_bbox[1]
+                    right_sub_bbox_y_axis = right_sub_bbox[3] - right_sub_bbox[1]
+
+                    if (
+                        abs(left_sub_bbox_y_axis - l_y_axis)
+                        + dis_by_directions['left'][i][0]
+                        > abs(right_sub_bbox_y_axis - l_y_axis)
+                        + dis_by_directions['right'][i][0]
+                    ):
+                        left_or_right = dis_by_directions['right'][i]
+                    else:
+                        left_or_right = dis_by_directions['left'][i]
+                else:
+                    left_or_right = dis_by_directions['left'][i]
+                    if left_or_right[1] > dis_by_directions['right'][i][1]:
+                        left_or_right = dis_by_directions['right'][i]
+            else:
+                left_or_right = dis_by_directions['left'][i]
+                if left_or_right[1] == float('inf'):
+                    left_or_right = dis_by_directions['right'][i]
+        else:
+            left_or_right = [-1, float('inf')]
+
+        if dis_by_directions['top'][i][1] != float('inf') or dis_by_directions[
+            'bottom'
+        ][i][1] != float('inf'):
+            if dis_by_directions['top'][i][1] != float('inf') and dis_by_directions[
+                'bottom'
+            ][i][1] != float('inf'):
+                if AXIS_MULPLICITY * axis_unit >= abs(
+                    dis_by_directions['top'][i][1]
+                    - dis_by_directions['bottom'][i][1]
+                ):
+                    top_bottom = subjects[dis_by_directions['bottom'][i][0]]['bbox']
+                    bottom_top = subjects[dis_by_directions['top'][i][0]]['bbox']
+
+                    top_bottom_x_axis = top_bottom[2] - top_bottom[0]
+                    bottom_top_x_axis = bottom_top[2] - bottom_top[0]
+                    if (
+                        abs(top_bottom_x_axis - l_x_axis)
+                        + dis_by_directions['bottom'][i][1]
+                        > abs(bottom_top_x_axis - l_x_axis)
+                        + dis_by_directions['top'][i][1]
+                    ):
+                        top_or_bottom = dis_by_directions['top'][i]
+                    else:
+                        top_or_bottom = dis_by_directions['bottom'][i]
+                else:
+                    top_or_bottom = dis_by_directions['top'][i]
+                    if top_or_bottom[1] > dis_by_directions['bottom'][i][1]:
+                        top_or_bottom = dis_by_directions['bottom'][i]
+            else:
+                top_or_bottom = dis_by_directions['top'][i]
+                if top_or_bottom[1] == float('inf'):
+                    top_or_bottom = dis_by_directions['bottom'][i]
+        else:
+            top_or_bottom = [-1, float('inf')]
+
+        if left_or_right[1] != float('inf') or top_or_bottom[1] != float('inf'):
+            if left_or_right[1] != float('inf') and top_or_bottom[1] != float(
+                'inf'
+            ):
+                if AXIS_MULPLICITY * axis_unit >= abs(
+                    left_or_right[1] - top_or_bottom[1]
+                ):
+                    y_axis_bbox = subjects[left_or_right[0]]['bbox']
+                    x_axis_bbox = subjects[top_or_bottom[0]]['bbox']
+
+                    if (
+                        abs((x_axis_bbox[2] - x_axis_bbox[0]) - l_x_axis) / l_x_axis
+                        > abs((y_axis_bbox[3] - y_axis_bbox[1]) - l_y_axis)
+                        / l_y_axis
+                    ):
+                        sub_obj_map_h[left_or_right[0]].append(i)
+                    else:
+                        sub_obj_map_h[top_or_bottom[0]].append(i)
+                else:
+                    if left_or_right[1] > top_or_bottom[1]:
+                        sub_obj_map_h[top_or_bottom[0]].append(i)
+                    else:
+                        sub_obj_map_h[left_or_right[0]].append(i)
+            else:
+                if left_or_right[1] != float('inf'):
+                    sub_obj_map_h[left_or_right[0]].append(i)
+                else:
+                    sub_obj_map_h[top_or_bottom[0]].append(i)
+    ret = []
+    for i in sub_obj_map_h.keys():
+        ret.append(
+            {
+                'sub_bbox': {
+                    'bbox': subjects[i]['bbox'],
+                    'score': subjects[i]['score'],
+                },
+                'obj_bboxes': [
+                    {'score': objects[j]['score'], 'bbox': objects[j]['bbox']}
+                    for j in sub_obj_map_h[i]
+                ],
+                'sub_idx': i,
+            }
+        )
+    return ret
+
+
+class _ScalarTieUpMagicModel(MagicModel):
+    def _MagicModel__tie_up_category_by_distance_v2(self, page_no, subject_category_id, object_category_id,
+                                                    priority_pos):
+        return _tie_up_category_by_distance_v2_scalar(
+            self._MagicModel__get_dets_by_category(page_no, subject_category_id),
+            self._MagicModel__get_dets_by_category(page_no, object_category_id),
+            priority_pos,
+        )
+
+
+class _Pix:
+    w = 600
+    h = 800
+
+
+class _Page:
+    def get_pixmap(self, dpi=72):
+        return _Pix()
+
+
+class _Docs:
+    def get_page(self, page_no):
+        return _Page()
+
+
+def _random_model_list(rng, page_count, det_count, grid):
+    """Pages aléatoires dont les coordonnées sont arrondies à une grille, pour provoquer des distances égales et
+    des chevauchements partiels."""
+    model_list = []
+    for page_no in range(page_count):
+        layout_dets = []
+        for _ in range(det_count):
+            x0, y0 = rng.randrange(0, 1100, grid), rng.randrange(0, 1500, grid)
+            x1, y1 = x0 + rng.randrange(grid, 300, grid), y0 + rng.randrange(grid, 200, grid)
+            layout_dets.append({
+                'category_id': rng.choice([1, 3, 4, 5, 6, 7]),
+                'poly': [x0, y0, x1, y0, x1, y1, x0, y1],
+                'score': round(rng.random(), 2),
+            })
+        model_list.append({'layout_dets': layout_dets, 'page_info': {'page_no': page_no, 'width': 1200,
+                                                                      'height': 1600}})
+    return model_list
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_tie_up_matches_scalar_implementation(seed):
+    rng = random.Random(seed)
+    for _ in range(20):
+        model_list = _random_model_list(rng, rng.randint(1, 3), rng.randint(0, 30), rng.choice([1, 7, 20, 50]))
+        magic_model = MagicModel(copy.deepcopy(model_list), _Docs())
+        scalar_magic_model = _ScalarTieUpMagicModel(copy.deepcopy(model_list), _Docs())
+        for page_no in range(len(model_list)):
+            assert magic_model.get_imgs_v2(page_no) == scalar_magic_model.get_imgs_v2(page_no)
+            assert magic_model.get_tables_v2(page_no) == scalar_magic_model.get_tables_v2(page_no)
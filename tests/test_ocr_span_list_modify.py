@@ -0,0 +1,154 @@
+import copy
+import random
+
+import pytest
+
+from panda_vision.config.drop_tag import DropTag
+from panda_vision.libs.boxbase import (calculate_iou,
+                                    get_minbox_if_overlap_by_ratio,
+                                    get_touching_bbox_indices)
+from panda_vision.pre_proc.ocr_span_list_modify import (
+    remove_overlaps_low_confidence_spans, remove_overlaps_min_spans)
+
+# Implémentations par comparaison de tous les couples avant l'index en grille, figées comme référence
+
+
+def remove_overlaps_low_confidence_spans_reference(spans):
+    dropped_spans = []
+    for span1 in spans:
+        for span2 in spans:
+            if span1 != span2:
+                if span1 in dropped_spans or span2 in dropped_spans:
+                    continue
+                else:
+                    if calculate_iou(span1['bbox'], span2['bbox']) > 0.9:
+                        if span1['score'] < span2['score']:
+                            span_need_remove = span1
+                        else:
+                            span_need_remove = span2
+                        if (
+                            span_need_remove is not None
+                            and span_need_remove not in dropped_spans
+                        ):
+                            dropped_spans.append(span_need_remove)
+
+    if len(dropped_spans) > 0:
+        for span_need_remove in dropped_spans:
+            spans.remove(span_need_remove)
+            span_need_remove['tag'] = DropTag.SPAN_OVERLAP
+
+    return spans, dropped_spans
+
+
+def remove_overlaps_min_spans_reference(spans):
+    dropped_spans = []
+    for span1 in spans:
+        for span2 in spans:
+            if span1 != span2:
+                if span1 in dropped_spans or span2 in dropped_spans:
+                    continue
+                else:
+                    overlap_box = get_minbox_if_overlap_by_ratio(span1['bbox'], span2['bbox'], 0.65)
+                    if overlap_box is not None:
+                        span_need_remove = next((span for span in spans if span['bbox'] == overlap_box), None)
+                        if span_need_remove is not None and span_need_remove not in dropped_spans:
+                            dropped_spans.append(span_need_remove)
+    if len(dropped_spans) > 0:
+        for span_need_remove in dropped_spans:
+            spans.remove(span_need_remove)
+            span_need_remove['tag'] = DropTag.SPAN_OVERLAP
+
+    return spans, dropped_spans
+
+
+def _random_spans(rng, span_count, grid):
+    """Spans aléatoires avec des doublons égaux, des spans de même bbox, des bbox presque identiques et des scores
+    égaux."""
+    spans = []
+    for _ in range(span_count):
+        draw = rng.random()
+        if spans and draw < 0.1:
+            spans.append(copy.deepcopy(rng.choice(spans)))
+            continue
+        if spans and draw < 0.2:
+            span = copy.deepcopy(rng.choice(spans))
+            span['content'] = str(rng.random())
+            spans.append(span)
+            continue
+        if spans and draw < 0.4:
+            x0, y0, x1, y1 = rng.choice(spans)['bbox']
+            delta = rng.choice([0, 1, 2, grid])
+            bbox = [x0 + rng.randint(-delta, delta), y0 + rng.randint(-delta, delta),
+                    x1 + rng.randint(-delta, delta), y1 + rng.randint(-delta, delta)]
+        else:
+            x0, y0 = rng.randrange(0, 300, grid), rng.randrange(0, 300, grid)
+            bbox = [x0, y0, x0 + rng.randrange(grid, 60, grid), y0 + rng.randrange(grid, 30, grid)]
+        if rng.random() < 0.2:
+            bbox = [coordinate + 0.5 for coordinate in bbox]
+        spans.append({'bbox': bbox, 'score': rng.choice([0.5, 0.9, 1.0, round(rng.random(), 3)]), 'type': 'text',
+                      'content': 'a'})
+    return spans
+
+
+@pytest.mark.parametrize('remove_overlaps, remove_overlaps_reference', [
+    (remove_overlaps_low_confidence_spans, remove_overlaps_low_confidence_spans_reference),
+    (remove_overlaps_min_spans, remove_overlaps_min_spans_reference),
+])
+@pytest.mark.parametrize('seed', range(10))
+def test_remove_overlaps_matches_reference(remove_overlaps, remove_overlaps_reference, seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        spans = _random_spans(rng, rng.randint(0, 60), rng.choice([1, 3, 10]))
+        reference_spans = copy.deepcopy(spans)
+        # Positions d'origine pour comparer les spans retirés par identité et non par égalité
+        positions = {id(span): i for i, span in enumerate(spans)}
+        reference_positions = {id(span): i for i, span in enumerate(reference_spans)}
+
+        try:
+            reference_kept, reference_dropped = remove_overlaps_reference(reference_spans)
+        except ZeroDivisionError:
+            # Deux bbox de surface nulle qui se touchent, l'IoU n'est pas défini
+            with pytest.raises(ZeroDivisionError):
+                remove_overlaps(spans)
+            continue
+        kept, dropped = remove_overlaps(spans)
+
+        assert kept is spans
+        assert [positions[id(span)] for span in kept] == [reference_positions[id(span)] for span in reference_kept]
+        assert [positions[id(span)] for span in dropped] == [
+            reference_positions[id(span)] for span in reference_dropped
+        ]
+        assert kept == reference_kept and dropped == reference_dropped
+
+
+def test_touching_bbox_indices_edges_and_corners():
+    bboxes = [[0, 0, 10, 10], [10, 0, 20, 10], [20, 10, 30, 20], [31, 0, 40, 10]]
+    # Un bord ou un coin commun suffit
+    assert get_touching_bbox_indices(bboxes) == [[1], [0, 2], [1], []]
+
+
+def test_touching_bbox_indices_inverted_boxes():
+    bboxes = [[0, 0, 10, 10], [8, 2, 2, 8], [5, 5, 15, 15], [6, 9, 9, 6]]
+    assert get_touching_bbox_indices(bboxes) == [[2], [], [0], []]
+
+
+def test_touching_bbox_indices_page_wide_box():
+    words = [[x, y, x + 8, y + 4] for y in range(0, 800, 10) for x in range(0, 600, 10)]
+    bboxes = words + [[0, 0, 600, 800]]
+    touching = get_touching_bbox_indices(bboxes)
+    assert touching[-1] == list(range(len(words)))
+    assert all(neighbours == [len(words)] for neighbours in touching[:-1])
+
+
+def test_touching_bbox_indices_match_all_pairs():
+    rng = random.Random(0)
+    bboxes = []
+    for _ in range(300):
+        x0, y0 = rng.uniform(0, 500), rng.uniform(0, 700)
+        bboxes.append([x0, y0, x0 + rng.choice([0, rng.uniform(0, 80)]), y0 + rng.choice([0, rng.uniform(0, 30)])])
+    expected = [
+        [j for j, bbox2 in enumerate(bboxes) if j != i and max(bbox1[0], bbox2[0]) <= min(bbox1[2], bbox2[2])
+         and max(bbox1[1], bbox2[1]) <= min(bbox1[3], bbox2[3])]
+        for i, bbox1 in enumerate(bboxes)
+    ]
+    assert get_touching_bbox_indices(bboxes) == expected
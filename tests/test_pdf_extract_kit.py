@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+# Le module charge torch, paddle et les modèles de mise en page dès l'import
+pdf_extract_kit = pytest.importorskip('panda_vision.model.pdf_extract_kit')
+
+from panda_vision.config.constants import MODEL_NAME  # noqa: E402
+from panda_vision.model.model_list import AtomicModel  # noqa: E402
+from panda_vision.model.sub_modules.table.table_worker import TableWorker  # noqa: E402
+
+
+class _FakeRapidTable:
+    def predict(self, image):
+        return '<table><tr><td>1</td></tr></table>', [], 0.0
+
+
+class _FakeAtomModelSingleton:
+    """Remplace le chargement des poids, seul le modèle de tableau est appelé par les tests."""
+
+    def get_atom_model(self, atom_model_name, **kwargs):
+        if atom_model_name == AtomicModel.Table:
+            return _FakeRapidTable()
+        return object()
+
+
+def _build_model(monkeypatch, isolate):
+    monkeypatch.setattr(pdf_extract_kit, 'AtomModelSingleton', _FakeAtomModelSingleton)
+    return pdf_extract_kit.CustomPEKModel(
+        layout_config={'model': MODEL_NAME.DocLayout_YOLO},
+        formula_config={'enable': False},
+        table_config={'enable': True, 'model': MODEL_NAME.RAPID_TABLE, 'isolate': isolate},
+    )
+
+
+def test_build_with_isolated_table_model(monkeypatch):
+    model = _build_model(monkeypatch, isolate=True)
+    assert isinstance(model.table_worker, TableWorker)
+
+
+def test_table_predict_in_process(monkeypatch):
+    model = _build_model(monkeypatch, isolate=False)
+    assert model.table_worker is None
+
+    image = np.full((200, 300, 3), 255, dtype=np.uint8)
+    table_res = {'category_id': 5, 'poly': [10, 20, 210, 20, 210, 120, 10, 120], 'score': 0.9}
+    model._CustomPEKModel__table_predict(image, [table_res])
+    assert table_res['html'] == '<table><tr><td>1</td></tr></table>'
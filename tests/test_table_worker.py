@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+
+from panda_vision.config.constants import MODEL_NAME
+from panda_vision.model.sub_modules.table.table_worker import TableWorker
+
+HTML_CODE = '<table><tr><td>1</td></tr></table>'
+
+
+def _fake_worker_main(conn, table_model_name, table_model_path, table_max_time, device):
+    """Remplace le chargement du modèle : une image non nulle simule un tableau qui ne termine jamais."""
+    conn.send(('ready', None))
+    while True:
+        image = conn.recv()
+        if image is None:
+            break
+        if image.any():
+            time.sleep(60)
+        conn.send(('ok', HTML_CODE))
+    conn.close()
+
+
+class _FakeTableWorker(TableWorker):
+    worker_main = staticmethod(_fake_worker_main)
+
+
+def _build_worker():
+    return _FakeTableWorker(MODEL_NAME.RAPID_TABLE, '', table_max_time=1)
+
+
+def test_predict_returns_html():
+    with _build_worker() as worker:
+        assert worker.predict(np.zeros((8, 8, 3), dtype=np.uint8)) == HTML_CODE
+
+
+def test_predict_over_max_time_kills_worker():
+    with _build_worker() as worker:
+        worker.predict(np.zeros((8, 8, 3), dtype=np.uint8))
+        process = worker._process
+
+        start = time.time()
+        assert worker.predict(np.ones((8, 8, 3), dtype=np.uint8)) is None
+        assert time.time() - start < 10
+        assert not process.is_alive()
+        assert worker._process is None
+
+        # Le processus est redémarré au tableau suivant
+        assert worker.predict(np.zeros((8, 8, 3), dtype=np.uint8)) == HTML_CODE
+        assert worker._process is not process
+
+
+def test_close_stops_worker():
+    worker = _build_worker()
+    with worker:
+        worker.predict(np.zeros((8, 8, 3), dtype=np.uint8))
+        process = worker._process
+    assert not process.is_alive()
+    assert worker._process is None